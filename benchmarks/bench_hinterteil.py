@@ -0,0 +1,51 @@
+""" Benchmarks for converting Hinterteil responses to DataFrames.
+    Runs on synthetic responses, no server needed.
+
+    $ python -m benchmarks.bench_hinterteil
+"""
+from pandas import DataFrame
+
+from raumzeit import hinterteil
+
+from .util import timed
+
+URL = 'http://localhost:5000/api/venue'
+
+
+def make_response(num_rows):
+    """ A Flask-restless style response of venues with a nested relation. """
+    rows = [{'id': i,
+             'name': 'venue {i}'.format(i=i),
+             'lat': 52.5 + i * 1e-6,
+             'lon': 13.4 + i * 1e-6,
+             'adress_string': 'Somestreet {i}'.format(i=i),
+             'description': 'A venue',
+             'third_party': {'id': i % 10, 'name': 'thirdParty'}}
+            for i in range(num_rows)]
+    return {'objects': rows, 'page': 1, 'total_pages': 1, 'num_results': num_rows}
+
+
+def add_uri_apply(df, url, id_col='id', url_col='remote_url'):
+    """ The previous implementation of _add_uri, one python call per row. """
+    url = url.rstrip('/') + '/'
+    df[url_col] = df[id_col].apply(lambda id: url + str(id))
+    return df
+
+
+def bench_get_df(num_rows=100000):
+    resp_dict = make_response(num_rows)
+    flat_df = DataFrame(hinterteil._response_rows(resp_dict))
+
+    print('get_df conversion, {n} rows'.format(n=num_rows))
+    elapsed = timed(lambda: add_uri_apply(flat_df.copy(), URL), repeat=3)
+    print('  remote_url, apply:       {ms:9.2f} ms'.format(ms=elapsed * 1000))
+    elapsed = timed(lambda: hinterteil._add_uri(flat_df.copy(), URL), repeat=3)
+    print('  remote_url, list:        {ms:9.2f} ms'.format(ms=elapsed * 1000))
+    elapsed = timed(hinterteil._response_to_dataframe, resp_dict, URL, repeat=3)
+    print('  nested DataFrames:       {ms:9.2f} ms'.format(ms=elapsed * 1000))
+    elapsed = timed(hinterteil._response_to_frames, resp_dict, URL, repeat=3)
+    print('  normalized:              {ms:9.2f} ms'.format(ms=elapsed * 1000))
+
+
+if __name__ == '__main__':
+    bench_get_df()
@@ -0,0 +1,71 @@
+""" Benchmark for Repository.slugify over venue and artist names.
+
+    $ python -m benchmarks.bench_slugify
+"""
+import hashlib
+import itertools
+import random
+from unicodedata import normalize as uni_normalize
+
+from raumzeit import repo
+from raumzeit.repo import Repository
+
+from .util import timed
+
+VENUES = ['Kater Holzig', 'Berghain / Panorama Bar', 'Club der Visionäre', 'Sisyphos',
+          'Salon zur Wilden Renate', 'about blank', 'Tresor', 'Watergate', 'Wilde Renate',
+          'Golden Gate', 'KitKatClub', 'Süß war gestern', 'Müllerstraße 12', 'Café Zapata',
+          'Ostgut Ton Showcase', 'Griessmühle', 'Chalet', 'Ritter Butzke', 'Mensch Meier',
+          'Fitzroy', 'SO36', 'Festsaal Kreuzberg', "Bi Nuu", 'Lido', 'Privatclub']
+ARTISTS = ['Ellen Allien', 'Dixon', 'Âme', 'Marcel Dettmann', 'Ben Klock', 'Nina Kraviz',
+           'Ricardo Villalobos', 'Zip', 'Sonja Moonear', 'DJ Koze', 'Møme', 'Róisín Murphy',
+           'Jürgen Paape', 'Mr. Oizo', 'Âme & Dixon', 'Live DJ Set', 'Tama Sumo', 'Prosumer',
+           'Nicolas Jaar', 'Agnès', 'Kollektiv Turmstraße', 'Dapayk & Padberg', 'Ø [Phase]']
+SUFFIXES = ['', ' (live)', ' b2b Friends', ' – Opening', ' presents: Night 1', ' & Guests']
+
+
+def corpus(size=20000, seed=1):
+    """ Names with the repetition typical for an import run. """
+    rnd = random.Random(seed)
+    names = [name + suffix for name, suffix in itertools.product(VENUES + ARTISTS, SUFFIXES)]
+    return [rnd.choice(names) for _ in range(size)]
+
+
+def slugify_per_word(text, hash_dct=False, delim='-', hash_chars=10, punct_re=repo._punct_re):
+    """ The previous implementation, which normalised every word on its own. """
+    def calc_hash(dct):
+        dct_str = str(sorted(dct.items()))
+        bytes = uni_normalize('NFKD', dct_str).encode('ascii', 'ignore')
+        return hashlib.sha224(bytes).hexdigest()
+
+    result = []
+    for word in punct_re.split(text.lower()):
+        word = uni_normalize('NFKD', word).encode('ascii', 'ignore')
+        if word:
+            result.append(word.decode('utf-8'))
+    if hash_dct:
+        result.append(calc_hash(hash_dct)[:hash_chars])
+    return delim.join(result)
+
+
+def timed_uncached(func):
+    """ Times func with an empty slug cache before each call. """
+    return timed(func, setup=repo._slugify_text.cache_clear)
+
+
+def bench_slugify(names):
+    single_pass = repo._slugify_text.__wrapped__
+
+    print('slugify, {n} names, {u} distinct'.format(n=len(names), u=len(set(names))))
+    elapsed = timed_uncached(lambda: [slugify_per_word(name) for name in names])
+    print('  per word NFKD:     {ms:8.2f} ms'.format(ms=elapsed * 1000))
+    elapsed = timed_uncached(lambda: [single_pass(name, '-', repo._punct_re) for name in names])
+    print('  single NFKD pass:  {ms:8.2f} ms'.format(ms=elapsed * 1000))
+    elapsed = timed_uncached(lambda: [Repository.slugify(name) for name in names])
+    print('  cached:            {ms:8.2f} ms'.format(ms=elapsed * 1000))
+    elapsed = timed_uncached(lambda: [Repository.slugify(name, {'name': name}) for name in names])
+    print('  cached, hashed:    {ms:8.2f} ms'.format(ms=elapsed * 1000))
+
+
+if __name__ == '__main__':
+    bench_slugify(corpus())
@@ -0,0 +1,98 @@
+""" Benchmarks for the Timeline. Needs a running neo4j instance,
+    the same one the test suite uses.
+
+    $ python -m benchmarks.bench_timeline
+"""
+from datetime import datetime, timedelta
+
+import py2neo
+
+from raumzeit.dates import ISO_FORMAT, parse_iso
+from raumzeit.repo import Timeline, NeoRepository, HappeningCollection, LocationCollection
+
+from .util import timed
+
+HOST = 'localhost'
+neo_uri = 'http://{host}:7474/db/data/'.format(host=HOST)
+
+
+def bench_create_timespan(graph, span_hours=(1, 3, 24, 72, 168)):
+    """ Creating a timespan should cost the same regardless of its length. """
+    graph.delete_all()
+    tl = Timeline(graph)
+    start = datetime(2014, 1, 1)
+    tl._extend_timeline(start, start + timedelta(hours=max(span_hours)))
+
+    print('create_timespan')
+    for num_hours in span_hours:
+        elapsed = timed(tl.create_timespan, start, start + timedelta(hours=num_hours))
+        print('  {h:>4} hours: {ms:8.2f} ms'.format(h=num_hours, ms=elapsed * 1000))
+
+
+def bench_iter_timeframe(graph, num_happenings=500, windows=(24, 24 * 7, 24 * 30)):
+    """ Compares the timeframe query modes on a timeline spanning a year of hours. """
+    graph.delete_all()
+    tl = Timeline(graph)
+    repo = NeoRepository(graph)
+    happenings = HappeningCollection(repo, tl)
+    year_start = datetime(2014, 1, 1)
+    tl._extend_timeline(year_start, datetime(2014, 12, 31, 23))
+
+    location = LocationCollection(repo).create({'name': 'bench location'},
+                                               {'lat': 51.1, 'lon': 13.1, 'string': 'Somestreet. 1'},
+                                               [{'name': 'bench', 'url': 'http://bench.example.com'}])
+    step = timedelta(hours=365 * 24 // num_happenings)
+    records = [{'start': year_start + i * step,
+                'stop': year_start + i * step + timedelta(hours=4),
+                'props': {'name': 'bench happening {i}'.format(i=i)},
+                'location': location,
+                'artists': [],
+                'links': [{'name': 'bench', 'url': 'http://bench.example.com/{i}'.format(i=i)}]}
+               for i in range(num_happenings)]
+    happenings.create_many(records, read_back=False)
+
+    print('iter_timeframe over a year of hours')
+    start = datetime(2014, 6, 1)
+    for num_hours in windows:
+        stop = start + timedelta(hours=num_hours)
+        rows = {}
+        for mode in sorted(happenings.TIMEFRAME_QUERIES):
+            rows[mode] = sorted(h['slug'] for h in happenings.iter_timeframe(start, stop, mode=mode))
+            elapsed = timed(lambda: list(happenings.iter_timeframe(start, stop, mode=mode)))
+            print('  {h:>4} hours, {m:>9}: {ms:8.2f} ms'.format(h=num_hours, m=mode, ms=elapsed * 1000))
+        assert rows['range'] == rows['traversal']
+
+
+def bench_hour_strings(span_days=(7, 30, 365, 3 * 365)):
+    """ Compares building hour strings in python and with numpy. """
+    start = datetime(2014, 1, 1)
+    print('hour strings')
+    for num_days in span_days:
+        stop = start + timedelta(days=num_days)
+        python_elapsed = timed(lambda: list(Timeline._iter_hour_strings(start, stop)))
+        numpy_elapsed = timed(Timeline._hour_strings_np, start, stop)
+        print('  {d:>5} days: python {p:8.2f} ms, numpy {n:8.2f} ms'.format(
+            d=num_days, p=python_elapsed * 1000, n=numpy_elapsed * 1000))
+
+
+def bench_str_to_dt(num_strings=10000):
+    """ Compares parsing hour strings with strptime, the sliced fast path and the memo cache. """
+    strings = list(Timeline._iter_hour_strings(datetime(2014, 1, 1), datetime(2014, 1, 1) + timedelta(hours=num_strings - 1)))
+    boundary = strings[-1]
+    uncached = parse_iso.__wrapped__
+
+    print('str_to_dt, {n} strings'.format(n=num_strings))
+    elapsed = timed(lambda: [datetime.strptime(s, ISO_FORMAT) for s in strings])
+    print('  strptime:  {ms:8.2f} ms'.format(ms=elapsed * 1000))
+    elapsed = timed(lambda: [uncached(s) for s in strings])
+    print('  sliced:    {ms:8.2f} ms'.format(ms=elapsed * 1000))
+    elapsed = timed(lambda: [Timeline._str_to_dt(boundary) for s in strings])
+    print('  memoized:  {ms:8.2f} ms'.format(ms=elapsed * 1000))
+
+
+if __name__ == '__main__':
+    bench_hour_strings()
+    bench_str_to_dt()
+    graph = py2neo.Graph(neo_uri)
+    bench_create_timespan(graph)
+    bench_iter_timeframe(graph)
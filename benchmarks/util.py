@@ -0,0 +1,16 @@
+""" Helpers shared by the benchmark scripts. """
+import time
+
+
+def timed(func, *args, repeat=5, setup=None):
+    """ Returns the best wall clock time of `repeat` calls.
+        `setup` is called untimed before each call. """
+    best = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        before = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - before
+        best = elapsed if best is None else min(best, elapsed)
+    return best
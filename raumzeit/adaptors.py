@@ -1,5 +1,8 @@
-from .hinterteil import Hinterteil
+from collections import defaultdict
+
+from .hinterteil import Hinterteil, _response_rows
 from .core import Location, Happening
+from .dates import ISO_FORMAT, parse_iso
 
 def AbstractAdaptor(object):
 
@@ -13,20 +16,94 @@ def AbstractAdaptor(object):
 
 class HinterteilAdaptor(object):
 
-    def __init__(self, url):
-        self.db = Hinterteil(url)
+    def __init__(self, url, session=None):
+        self.db = Hinterteil(url, session=session)
         self.locations = []
+        self._locations_by_id = {}
 
-    def get_locations(self):
-        locations_df = self.db.get_df('venue')
-        
-        for i, row in locations_df.T.iteritems():
-            print()
-            print(row.index)
-            print()
-            name = row['name']
-            lat, lon = row['lat'], row['lon']
-            address = row['adress_string'] #TODO fix this typo in db schema
-            #address = row['address_string']
-            desc = row['description']
-            yield Location(name, lat, lon, address, desc)
\ No newline at end of file
+    def get_locations(self, results_per_page=None, workers=1):
+        '''
+        Yields a ``Location`` for every venue as soon as its page arrived,
+        so only a few pages are held in memory at a time.
+        See ``Hinterteil.iter_pages`` for the arguments.
+        '''
+        for page in self.db.iter_pages('venue', results_per_page=results_per_page, workers=workers):
+            for row in _response_rows(page):
+                yield self._to_location(row)
+
+    def get_happenings(self, location, after, before, results_per_page=None):
+        '''
+        Yields the happenings at ``location`` overlapping the timespan
+        from ``after`` to ``before``, ordered by their start.
+        '''
+        grouped = self.get_happenings_by_location(after, before, [location], results_per_page)
+        for happening in grouped.get(location._db_info['id'], []):
+            yield happening
+
+    def get_happenings_by_location(self, after, before, locations=None, results_per_page=None, workers=1):
+        '''
+        Returns a dict of venue id to the list of happenings there that overlap
+        the timespan from ``after`` to ``before``, each list ordered by start.
+        The timespan and the venues are filtered by the server, so all locations
+        of a view are served by one query instead of one request per location.
+        Without ``locations`` the happenings of all venues are returned, their
+        location is not set. See ``active_happenings_bulk`` to get it resolved.
+        '''
+        by_id, venue_ids = {}, None
+        if locations is not None:
+            by_id = {location._db_info['id']: location for location in locations}
+            venue_ids = list(by_id)
+
+        grouped = defaultdict(list)
+        for row in self._iter_happening_rows(after, before, venue_ids, results_per_page, workers):
+            venue_id = row['venue_id']
+            grouped[venue_id].append(self._to_happening(row, by_id.get(venue_id)))
+        return dict(grouped)
+
+    def active_happenings_bulk(self, start, end, results_per_page=None, workers=1):
+        '''
+        Yields all happenings overlapping the timespan from ``start`` to ``end``
+        with their location set, ordered by start. This is the bulk hook of
+        ``TimeAwareLayer``, every view is served by one events query.
+        The venues are requested once and kept in ``locations``, they are
+        requested again if an event refers to a venue that is not known yet.
+        '''
+        for row in self._iter_happening_rows(start, end, None, results_per_page, workers):
+            yield self._to_happening(row, self._location(row['venue_id']))
+
+    def _iter_happening_rows(self, after, before, venue_ids=None, results_per_page=None, workers=1):
+        filters = [{'name': 'start_datetime', 'op': '<', 'val': before.strftime(ISO_FORMAT)},
+                   {'name': 'end_datetime', 'op': '>', 'val': after.strftime(ISO_FORMAT)}]
+        if venue_ids is not None:
+            filters.append({'name': 'venue_id', 'op': 'in', 'val': venue_ids})
+        query = {'filters': filters, 'order_by': [{'field': 'start_datetime', 'direction': 'asc'}]}
+
+        for page in self.db.iter_pages('event', query, results_per_page, workers):
+            for row in _response_rows(page):
+                yield row
+
+    def _location(self, venue_id):
+        if venue_id not in self._locations_by_id:
+            self.locations = list(self.get_locations())
+            self._locations_by_id = {location._db_info['id']: location for location in self.locations}
+        return self._locations_by_id.get(venue_id)
+
+    @staticmethod
+    def _to_happening(row, location=None):
+        return Happening(row['name'], _parse_datetime(row['start_datetime']),
+                         _parse_datetime(row['end_datetime']), row.get('slug'),
+                         {'table': 'event', 'id': row['id']}, location=location)
+
+    @staticmethod
+    def _to_location(row):
+        location = Location(row['name'], row['lat'], row['lon'], row.get('slug'),
+                            {'table': 'venue', 'id': row['id']})
+        location.address = row.get('adress_string') #TODO fix this typo in db schema
+        #location.address = row.get('address_string')
+        location.description = row.get('description')
+        return location
+
+
+def _parse_datetime(value):
+    # Flask-Restless serializes datetimes with isoformat(), drop fractions and offsets
+    return parse_iso(value[:19])
@@ -1,4 +1,4 @@
-from .core import Location, Happening, SubHappening
+from .core import Location, Happening, HappeningIndex
 
 # class QueryHandler(object):
 #     '''
@@ -17,7 +17,7 @@ class Happenings(object):
         that lay in the timespan designated by the datetimes before and after.
         '''
 
-        for h in self.querier.get_happenings(location, before, after):
+        for h in self.querier.get_happenings(location, after, before):
             yield h
 
 class Locations(object):
@@ -30,14 +30,58 @@ class Locations(object):
 
     def all_active(self, after, before):
         for location in self.locations:
-            if self.is_active(location, before, after):
+            if self.is_active(location, after, before):
                 yield location
 
     def is_active(self, location, after, before):
-        in_timespan = self.happenings.filter_by_date(location, before, after)
+        in_timespan = self.happenings.filter_by_date(location, after, before)
         try:
             next(in_timespan)
             return True
         except StopIteration:
             return False
 
+
+
+class LocalQuerier(object):
+    '''
+    Answers timespan queries from happenings held in memory, using a
+    HappeningIndex per location and one over all of them.
+    Serves as the querier of Happenings and as the entity generator
+    of filters.TimeAwareLayer.
+    '''
+
+    def __init__(self, locations):
+        self.locations = list(locations)
+        self._index = HappeningIndex()
+        self._by_location = {}
+        for location in self.locations:
+            for happening in location.happenings:
+                self.add_happening(happening)
+
+    def add_happening(self, happening):
+        ''' Indexes a happening, its location has to be set. '''
+        self._index.insert(happening)
+        self._by_location.setdefault(happening.location, HappeningIndex()).insert(happening)
+
+    def remove_happening(self, happening):
+        self._index.remove(happening)
+        self._by_location[happening.location].remove(happening)
+
+    def get_happenings(self, location, after, before):
+        index = self._by_location.get(location)
+        if index is None:
+            return []
+        return index.overlapping(after, before)
+
+    def all_locations(self):
+        return iter(self.locations)
+
+    def active_happenings(self, location, start, end):
+        return self.get_happenings(location, start, end)
+
+    def active_happenings_bulk(self, start, end):
+        return self._index.overlapping(start, end)
+
+    def subhappenings(self, happening):
+        return iter(happening.persons)
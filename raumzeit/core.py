@@ -8,6 +8,8 @@
 # Happening = namedtuple('Happening', ['name', 'start', 'end', 'details', 'dbinfo'])
 # SubHappening = namedtuple('SubHappening', ['name', 'start', 'end', 'details', 'dbinfo'])
 
+import random
+
 
 
 def in_timespan(happening, start, end):
@@ -30,6 +32,146 @@ def timespans_overlap(start_end, other_start_end):
 
     return s1 < e2 and s2 < e1
 
+class HappeningIndex(object):
+    """In-memory index answering which happenings overlap a timespan.
+
+    A treap ordered by start, where every node also knows the latest end
+    in its subtree, so subtrees ending before a timespan are skipped.
+    Inserts and removals take O(log n) on average, an overlap query
+    O((k + 1) log n) for k results instead of a pass over all
+    happenings. Happenings must not change their start or end while
+    they are indexed.
+
+      >>> index = HappeningIndex(happenings)
+      >>> index.overlapping(start, end)
+    returns the happenings overlapping [start, end), ordered by start
+    """
+
+    def __init__(self, happenings=()):
+        self._root = None
+        self._keys = {}
+        self._counter = 0
+        for happening in happenings:
+            self.insert(happening)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, happening):
+        return id(happening) in self._keys
+
+    def __iter__(self):
+        stack, node = [], self._root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.happening
+            node = node.right
+
+    def insert(self, happening):
+        """Add a happening, adding one twice is a no op."""
+        if happening.start >= happening.end:
+            raise ValueError('Timespans must begin before they end.')
+        if id(happening) in self._keys:
+            return
+        self._counter += 1
+        key = (happening.start, self._counter)
+        self._keys[id(happening)] = key
+        self._root = _insert(self._root, _IndexNode(key, happening))
+
+    def remove(self, happening):
+        """Remove a happening, raises KeyError if it isn't indexed."""
+        key = self._keys.pop(id(happening))
+        self._root = _remove(self._root, key)
+
+    def overlapping(self, start, end):
+        """List the happenings overlapping [start, end), ordered by start."""
+        if start >= end:
+            raise ValueError('Timespans must begin before they end.')
+        result = []
+        _collect(self._root, start, end, result)
+        return result
+
+
+class _IndexNode(object):
+
+    __slots__ = ('key', 'happening', 'priority', 'max_end', 'left', 'right')
+
+    def __init__(self, key, happening):
+        self.key = key
+        self.happening = happening
+        self.priority = random.random()
+        self.max_end = happening.end
+        self.left = self.right = None
+
+    def update(self):
+        max_end = self.happening.end
+        for child in (self.left, self.right):
+            if child is not None and child.max_end > max_end:
+                max_end = child.max_end
+        self.max_end = max_end
+
+
+def _rotate_right(node):
+    top = node.left
+    node.left, top.right = top.right, node
+    node.update()
+    top.update()
+    return top
+
+def _rotate_left(node):
+    top = node.right
+    node.right, top.left = top.left, node
+    node.update()
+    top.update()
+    return top
+
+def _insert(node, new):
+    if node is None:
+        return new
+    if new.key < node.key:
+        node.left = _insert(node.left, new)
+        if node.left.priority > node.priority:
+            return _rotate_right(node)
+    else:
+        node.right = _insert(node.right, new)
+        if node.right.priority > node.priority:
+            return _rotate_left(node)
+    node.update()
+    return node
+
+def _remove(node, key):
+    if node is None:
+        raise KeyError(key)
+    if key < node.key:
+        node.left = _remove(node.left, key)
+    elif key > node.key:
+        node.right = _remove(node.right, key)
+    elif node.left is None:
+        return node.right
+    elif node.right is None:
+        return node.left
+    elif node.left.priority > node.right.priority:
+        node = _rotate_right(node)
+        node.right = _remove(node.right, key)
+    else:
+        node = _rotate_left(node)
+        node.left = _remove(node.left, key)
+    node.update()
+    return node
+
+def _collect(node, start, end, result):
+    if node is None or node.max_end <= start:
+        return
+    _collect(node.left, start, end, result)
+    happening = node.happening
+    if happening.start < end:
+        if start < happening.end:
+            result.append(happening)
+        _collect(node.right, start, end, result)
+
 # class BaseResource(metaclass=ABCMeta):
 #     """Abstract base class describing the hypermedia resource interface
 #     """
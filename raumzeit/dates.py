@@ -0,0 +1,25 @@
+""" Datetime helpers shared by the graph repository and the REST adaptors. """
+from datetime import datetime
+from functools import lru_cache
+
+ISO_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+@lru_cache(maxsize=1024)
+def parse_iso(date_string):
+    """ Parses a string in ISO_FORMAT. Strings of exactly that shape are sliced
+        apart instead of going through the much slower strptime. """
+    s = date_string
+    if (len(s) == 19 and s[4] == s[7] == '-' and s[10] == 'T' and s[13] == s[16] == ':' and
+            _is_ascii_digits(s[0:4] + s[5:7] + s[8:10] + s[11:13] + s[14:16] + s[17:19])):
+        try:
+            return datetime(int(s[0:4]), int(s[5:7]), int(s[8:10]),
+                            int(s[11:13]), int(s[14:16]), int(s[17:19]))
+        except ValueError:
+            pass
+    return datetime.strptime(date_string, ISO_FORMAT)
+
+
+def _is_ascii_digits(text):
+    # int() also takes signs, whitespace and non-ASCII digits, strptime doesn't
+    return text.isascii() and text.isdigit()
@@ -1,3 +1,5 @@
+from collections import OrderedDict
+
 from .core import Location, Happening, Person
 
 class TimeAwareLayer(object):
@@ -5,16 +7,45 @@ class TimeAwareLayer(object):
 
     Parameters: 
     entity_generator: a object that exposes the methods: all_locations(), active_happenings().
+    cache_size: number of recently set timespans whose results are kept in memory.
     """
-    def __init__(self, entity_generators):
+    def __init__(self, entity_generators, cache_size=16):
         self._entity_generators = entity_generators
+        self._cache_size = cache_size
+        self._timespans = OrderedDict()
 
     def set_timespan(self, start, end):
-        """Sets the current timespan and reloads the happenings."""
+        """Sets the current timespan and reloads the happenings.
+        Recently set timespans are served from memory.
+        """
         self.start = start
         self.end = end
-        
-    
+        self._current = self._load_timespan(start, end)
+
+    def invalidate(self, start=None, end=None):
+        """Drops the remembered results of a timespan, or of all timespans.
+        The current timespan is reloaded from the entity generators.
+        """
+        if start is None:
+            self._timespans.clear()
+        else:
+            self._timespans.pop((start, end), None)
+        if getattr(self, 'start', None) is not None:
+            self.set_timespan(self.start, self.end)
+
+    def _load_timespan(self, start, end):
+        """Returns the [(location, [(happening, [subhappenings])])] of a timespan."""
+        key = (start, end)
+        if key in self._timespans:
+            self._timespans.move_to_end(key)
+            return self._timespans[key]
+
+        result = [(location, [(happening, list(self._subhappenings(happening))) for happening in happenings])
+                  for location, happenings in self._happenings_by_location().items()]
+        self._timespans[key] = result
+        while len(self._timespans) > self._cache_size:
+            self._timespans.popitem(last=False)
+        return result
 
 
 
@@ -35,6 +66,29 @@ class TimeAwareLayer(object):
         for subhappening in self._entity_generators.subhappenings(happening):
             yield subhappening
 
+    def _happenings_by_location(self):
+        """Group the happenings that match set timespan by their location.
+        Uses the entity generator's active_happenings_bulk(start, end) if it has one,
+        it has to return all happenings of the timespan with their location set.
+        Otherwise every location is asked for its happenings on its own.
+        Either way happenings are ordered by start, and locations by their first happening.
+        """
+        bulk = getattr(self._entity_generators, 'active_happenings_bulk', None)
+        grouped = {}
+        if bulk is None:
+            for location in self._all_locations():
+                happenings = list(self._active_happenings(location))
+                if happenings:
+                    grouped[location] = happenings
+        else:
+            for happening in bulk(self.start, self.end):
+                grouped.setdefault(happening.location, []).append(happening)
+
+        for happenings in grouped.values():
+            happenings.sort(key=lambda happening: happening.start)
+        ordered = sorted(grouped.items(), key=lambda item: item[1][0].start)
+        return dict(ordered)
+
     # Additional logic
 
     def active_locations_happenings(self):
@@ -42,16 +96,9 @@ class TimeAwareLayer(object):
         happenings_subs is a generator of (happening, subhappenings) tuples.
         subhappenings is a generator of subhappenings.
         """
-        pass
-        for location in self._active_locations():
-            for happening_subs in _active_happenings_subs:
-                subhappenings = self._subhappenings(happening)
-                yield (happening, subhappenings)
-
-    def _active_happenings_subs(self, location):
-        for happening in self._active_happenings(location):
-            subhappenings = self._subhappenings(happening)
-            yield (happening, subhappenings)
+        for location, happenings_subs in self._current:
+            yield (location, ((happening, iter(subs)) for happening, subs in happenings_subs))
+
     # def _all_active_happenings_subs(self):
     #     """Iterate over (happening, subhappenings) tuples.
     #     subhappenings is a generator of subhappenings.
@@ -62,18 +109,12 @@ class TimeAwareLayer(object):
 
     def _all_active_happenings(self):
         """Iterate over happenings that match set timespan."""
-        for location in self._all_locations():
-            for happening in self._active_happenings(location):
+        for location, happenings_subs in self._current:
+            for happening, subs in happenings_subs:
                 yield happening
 
     
     def _active_locations(self):
         """Iterate over locations that have happenings in set timespan."""
-        for location in self._all_locations():
-            happenings = self._active_happenings(location)
-            try:
-                h = next(happenings)
-                yield location
-            except StopIteration:
-                pass
-
+        for location, happenings_subs in self._current:
+            yield location
@@ -1,15 +1,100 @@
 import requests
 from requests.utils import quote
 from requests import RequestException
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
-from pandas import DataFrame
+import time
+import threading
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pandas import DataFrame, concat
+
+
+class ResponseCache(object):
+    '''
+        Caches rows read by ``Hinterteil`` by table name and key.
+        Entries expire ``ttl`` seconds after they were stored, and the
+        least recently used entries are dropped beyond ``maxsize``.
+        ``hits`` and ``misses`` count the lookups.
+
+        Cached rows are shared between callers, so don't modify them.
+    '''
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, table_name, key):
+        ''' Returns the cached row or None. '''
+        with self._lock:
+            entry = self._entries.get((table_name, key))
+            if entry is not None and time.monotonic() - entry[1] > self.ttl:
+                del self._entries[(table_name, key)]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end((table_name, key))
+            return entry[0]
+
+    def put(self, table_name, key, row):
+        with self._lock:
+            self._entries[(table_name, key)] = (row, time.monotonic())
+            self._entries.move_to_end((table_name, key))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, table_name=None):
+        ''' Drops all entries of a table, or all entries if no table is passed. '''
+        with self._lock:
+            if table_name is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == table_name]:
+                    del self._entries[key]
 
 
 class Hinterteil(object):
 
-    def __init__(self, url):
+    def __init__(self, url, session=None, pool_size=10, timeout=10, retries=3, backoff_factor=0.3,
+                 cache=None):
+        '''
+            All requests go through one ``requests.Session`` so connections are kept alive.
+            ``pool_size`` is the number of connections kept open to the server,
+            raise it when the client is shared between threads. ``timeout`` is in seconds.
+            Failed reads are retried ``retries`` times with an exponential backoff,
+            writes are not as they may have reached the server.
+            A preconfigured ``session`` can be passed instead.
+
+            Pass a ``ResponseCache`` as ``cache`` to serve repeated ``get_by_primary``
+            and ``get_single`` calls from memory. Writes to a table drop its entries.
+        '''
         self.url = url
-
+        self.timeout = timeout
+        if session is None:
+            session = self._make_session(pool_size, retries, backoff_factor)
+        self.session = session
+        self.cache = cache
+
+    @staticmethod
+    def _make_session(pool_size, retries, backoff_factor):
+        # only reads are retried, a repeated PUT of {'add': [...]} would add the children twice
+        retry = Retry(total=retries, backoff_factor=backoff_factor, allowed_methods=frozenset(['GET']))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def close(self):
+        self.session.close()
 
     def get_by_primary(self, table_name, primary_key):
 
@@ -27,9 +112,13 @@ class Hinterteil(object):
         #key = quote(str(primary_key)
         key = primary_key
 
-        r = requests.get(url + table_name + '/' + key )
+        cached = self._cached(table_name, ('primary', key))
+        if cached is not None:
+            return cached
+
+        r = self.session.get(url + table_name + '/' + key, timeout=self.timeout)
         if r.ok:
-            return r.json()
+            return self._store(table_name, ('primary', key), r.json())
         else:
             raise IOError(r.status_code)
 
@@ -61,14 +150,32 @@ class Hinterteil(object):
         else:
             query = {'filters': [{'name': field_name, 'op': '==', 'val': value}], 'single': True}
             params= {'q':  json.dumps(query)}
+
+            cached = self._cached(table_name, params['q'])
+            if cached is not None:
+                return cached
             
-            r = requests.get(url + table_name, params=params)
+            r = self.session.get(url + table_name, params=params, timeout=self.timeout)
         
             if r.ok:
-                return r.json()
+                return self._store(table_name, params['q'], r.json())
             else:
                 raise IOError(r.status_code)
 
+    def _cached(self, table_name, key):
+        if self.cache is None:
+            return None
+        return self.cache.get(table_name, key)
+
+    def _store(self, table_name, key, row):
+        if self.cache is not None:
+            self.cache.put(table_name, key, row)
+        return row
+
+    def _invalidate(self, table_name):
+        if self.cache is not None:
+            self.cache.invalidate(table_name)
+
 
     # def insert_dict_a(self, table_name, payload):
     #     '''
@@ -118,19 +225,49 @@ class Hinterteil(object):
         >>> len(e['performances'])
         1
         '''
+        return self._add_children(table_name, item, field_name, [child_payload])
+
+    def append_children(self, table_name, item, field_name, child_payloads, bulk=True, workers=4):
+        '''
+        Adds many new items to a child table, see ``append_child``.
+        By default all children are sent in a single request. If the server
+        rejects it, or ``bulk`` is False, they are appended one by one with up
+        to ``workers`` concurrent requests. Timeouts and connection errors of
+        the single request are raised, as the server may have applied it.
+
+        Returns a list with a ``(parent_dict, exception)`` tuple per child,
+        where exception is None on success.
+        '''
+        child_payloads = list(child_payloads)
+        if bulk:
+            try:
+                parent = self._add_children(table_name, item, field_name, child_payloads)
+                return [(parent, None) for _ in child_payloads]
+            except RequestException as exc:
+                if not _rejected(exc):
+                    raise
+
+        def append(child_payload):
+            return self.append_child(table_name, item, field_name, child_payload)
+        return self._map_rows(append, child_payloads, workers)
+
+    def _add_children(self, table_name, item, field_name, child_payloads):
         url = self.url
 
-        payload = {field_name: {'add': [child_payload]}}
+        payload = {field_name: {'add': child_payloads}}
         json_payload = json.dumps(payload)
         headers = {'content-type': 'application/json'}
         request_url = url + table_name + '/' + str(item['id'])
-        r = requests.put(request_url, data=json_payload, headers=headers)
+        try:
+            r = self.session.put(request_url, data=json_payload, headers=headers, timeout=self.timeout)
+        finally:
+            self._invalidate(table_name)
         
         if r.ok:
             response_dict = r.json()
             return response_dict
         else:
-            raise IOError(r.status_code)
+            raise RequestException(r.status_code, response=r)
 
 
     def insert_dict(self, table_name, payload):
@@ -144,11 +281,61 @@ class Hinterteil(object):
             >>> ap = insert_dict('artist_page', {'url': 'http://abc.com', 'artist': {'id': a['id']}, 'third_party': {'id': tp['id']}})
             u'thirdPartyC'
         '''
+        return self._post(table_name, payload)
+
+    def insert_many(self, table_name, payloads, bulk=False, workers=4):
+        '''
+            Inserts many dict representations of table rows.
+            With ``bulk`` set, all rows are posted as one json list, for
+            backends that accept list POSTs. Otherwise, or if the server
+            rejects the list POST, rows are posted one by one with up to
+            ``workers`` concurrent requests. Timeouts and connection errors
+            of the list POST are raised, as the server may have applied it.
+
+            Returns a list with an ``(inserted_dict, exception)`` tuple per
+            row, where exception is None on success.
+        '''
+        payloads = list(payloads)
+        if bulk:
+            try:
+                inserted = self._post(table_name, payloads)
+            except RequestException as exc:
+                if not _rejected(exc):
+                    raise
+                inserted = None
+            if inserted is not None:
+                if isinstance(inserted, dict):
+                    inserted = inserted.get('objects', [])
+                if len(inserted) != len(payloads):
+                    raise RequestException('Bulk insert returned {n} rows for {m} payloads'.format(
+                        n=len(inserted), m=len(payloads)))
+                return [(row, None) for row in inserted]
+
+        def insert(payload):
+            return self.insert_dict(table_name, payload)
+        return self._map_rows(insert, payloads, workers)
+
+    def _map_rows(self, func, rows, workers):
+        ''' Calls ``func`` on every row with up to ``workers`` threads.
+            Returns a ``(result, exception)`` tuple per row, in order. '''
+        def call(row):
+            try:
+                return func(row), None
+            except IOError as exc:
+                return None, exc
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(call, rows))
+
+    def _post(self, table_name, payload):
         url = self.url
 
         json_payload = json.dumps(payload)
         headers = {'content-type': 'application/json'}
-        r = requests.post(url + table_name, data=json_payload, headers=headers)
+        try:
+            r = self.session.post(url + table_name, data=json_payload, headers=headers, timeout=self.timeout)
+        finally:
+            self._invalidate(table_name)
         
         status = str(r.status_code)
         if r.ok:
@@ -162,16 +349,17 @@ class Hinterteil(object):
                 response_dict = r.json()
                 msg = response_dict['message']
                 ex_msg = status + '/' + msg
-                raise RequestException(ex_msg)
+                raise RequestException(ex_msg, response=r)
             except:
-                raise RequestException(status)
+                raise RequestException(status, response=r)
     
         return response_dict
 
 
     
 
-    def get_df(self, table_name, item_id=None, query=None):
+    def get_df(self, table_name, item_id=None, query=None, all_pages=False,
+               results_per_page=None, workers=1, normalize=False):
         ''' 
         Requests a table and returns it as a pandas ``DataFrame``.
         Can be combined with a ``query`` argument that has to 
@@ -180,93 +368,216 @@ class Hinterteil(object):
         If an ``item_id`` is passed, it requests the specific item
         and returns it as a DataFrame with a single row.
 
+        Flask-restless paginates tables, so by default only the first
+        page is returned. Pass ``all_pages=True`` to follow all pages and
+        concatenate them, see ``iter_df`` for ``results_per_page`` and ``workers``.
+
         The returned DataFrame contains all fields of the response,
         plus a column ``remote_url`` which is compiled out of the 
         request url and the ``id`` field of the response.
+        Nested lists and dicts are stored as a DataFrame per cell.
+
+        With ``normalize=True`` a ``(df, children)`` tuple is returned instead.
+        ``df`` holds only the plain columns, ``children`` maps every nested
+        column to a single flat DataFrame whose ``parent_id`` column refers
+        to the ``id`` of the row in ``df``, so they can be joined.
         '''
+        url = self.url
+        to_frames = _response_to_frames if normalize else _response_to_dataframe
 
-        def _response_to_dataframe(response, request_url):
-            ''' Converts a ``requests`` json response to a ``pandas`` DataFrame '''
+        table_name = table_name.rstrip('/')
+        request_url = url + table_name
 
-            resp_dict = response.json()
+        # Single row case
+        if item_id:
+            response = self.session.get(request_url + '/' + str(item_id), timeout=self.timeout)
+            if not response.ok:
+                raise IOError(response.status_code)
+            return to_frames(response.json(), request_url)
 
-            # Table request
-            if 'objects' in resp_dict:
-                rows = resp_dict['objects']
+        # Normal collection-like case
+        if all_pages:
+            frames = list(self.iter_df(table_name, query, results_per_page, workers, normalize))
+            if normalize:
+                return _concat_frames(frames)
+            return concat(frames, ignore_index=True)
 
-            # single item request
-            else: 
-                rows = [resp_dict]
+        resp_dict = self._get_page(request_url, query, None, results_per_page)
+        return to_frames(resp_dict, request_url)
 
-            df = DataFrame(rows)
-            
-            # We look one Colunn deep for further dataframes
-            for col in df.columns:
-                df[col] = df[col].apply(_collection_to_df)
-                    
-            if len(df) > 0:
-                df = _add_uri(df, request_url)
-            
-            return df
-
-        def _collection_to_df(collection):
-            ''' Converts lists and dicts to DataFrame.
-                If neither a list nor a dict is found it
-                returns the unchanged argument
-            '''
-            if isinstance(collection, dict):
-                collection = [collection]
-            
-            if isinstance(collection, list):
-                try:
-                    df = DataFrame(collection)
-                except:
-                    raise
-                
-                return df
-            
-            else:
-                return collection
+    def iter_df(self, table_name, query=None, results_per_page=None, workers=1, normalize=False):
+        '''
+        Requests all pages of a table and yields one ``DataFrame`` per page,
+        or one ``(df, children)`` tuple if ``normalize`` is set, see ``get_df``.
+        Only a few pages are held in memory at a time. A column that held
+        nested values on one page is kept out of the main DataFrame of all
+        following pages.
+        See ``iter_pages`` for the other arguments.
+        '''
+        request_url = self.url + table_name.rstrip('/')
+        nested_cols = set()
+        for resp_dict in self.iter_pages(table_name, query, results_per_page, workers):
+            if not normalize:
+                yield _response_to_dataframe(resp_dict, request_url)
+                continue
+            df, children = _response_to_frames(resp_dict, request_url, nested_cols=nested_cols)
+            nested_cols.update(children)
+            yield df, children
+
+    def iter_pages(self, table_name, query=None, results_per_page=None, workers=1):
+        '''
+        Requests all pages of a table and yields the decoded json of each page in order.
+        ``results_per_page`` overrides the page size of the server, which may cap it.
+        With ``workers`` > 1 up to that many of the following pages are fetched
+        concurrently once the first page told us how many there are.
+        '''
+        request_url = self.url + table_name.rstrip('/')
+
+        first_page = self._get_page(request_url, query, 1, results_per_page)
+        yield first_page
+        pages = range(2, first_page.get('total_pages', 1) + 1)
+
+        if workers <= 1:
+            for page in pages:
+                yield self._get_page(request_url, query, page, results_per_page)
+            return
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for page in pages:
+                pending.append(executor.submit(self._get_page, request_url, query, page, results_per_page))
+                if len(pending) == workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def _get_page(self, request_url, query=None, page=None, results_per_page=None):
+        params = {}
+        if query:
+            params['q'] = json.dumps(query)
+        if page is not None:
+            params['page'] = page
+        if results_per_page is not None:
+            params['results_per_page'] = results_per_page
+
+        response = self.session.get(request_url, params=params or None, timeout=self.timeout)
+        if not response.ok:
+            raise IOError(response.status_code)
+        return response.json()
 
 
-        def _add_uri(df, url, id_col='id', url_col='remote_url'):
-            
-            if id_col in df:
-                url = url.rstrip('/') + '/'
-                urls = df[id_col].apply(lambda id: url + str(id))
-                df[url_col] = urls
-            
-            elif len(df.columns) == 0:
-                pass
-            
-            else:
-                raise KeyError('DataFrame doesnt have id column')
-                
-            return df
+def _rejected(exc):
+    ''' True if the server answered the request with an error status '''
+    return exc.response is not None and not exc.response.ok
 
+def _response_rows(resp_dict):
+    ''' Returns the list of row dicts in a decoded json response '''
 
-        url = self.url
+    # Table request
+    if 'objects' in resp_dict:
+        return resp_dict['objects']
 
-        table_name = table_name.rstrip('/')
-        request_url = url + table_name
+    # single item request
+    else: 
+        return [resp_dict]
 
-        # Single row case
-        if item_id:
-            response = requests.get(request_url + '/' + str(item_id))
+def _response_to_dataframe(resp_dict, request_url):
+    ''' Converts a decoded json response to a ``pandas`` DataFrame '''
 
-        # Normal collection-like case
-        else:
-            if query:
-                q = json.dumps(query)
-                params = {'q': q}
-            else:
-                params = None
-            response = requests.get(request_url, params=params)
-            
-        if response.ok:
-            df = _response_to_dataframe(response, request_url)
+    df = DataFrame(_response_rows(resp_dict))
+    
+    # We look one Colunn deep for further dataframes,
+    # only object columns can hold lists or dicts
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].apply(_collection_to_df)
             
-        else:
-            raise IOError(response.status_code)
+    if len(df) > 0:
+        df = _add_uri(df, request_url)
+    
+    return df
+
+def _response_to_frames(resp_dict, request_url, id_col='id', parent_col='parent_id', nested_cols=()):
+    ''' Converts a decoded json response to flat ``pandas`` DataFrames.
+        Returns a main DataFrame holding the plain columns, and a dict
+        of one DataFrame per nested column. Each row of a nested
+        DataFrame holds one of the nested dicts plus the id of its
+        parent row in ``parent_col``. Every DataFrame is built in one go.
+        ``nested_cols`` are treated as nested even if this response
+        holds no list or dict in them, e.g. from earlier pages.
+    '''
+    rows = _response_rows(resp_dict)
+
+    nested_cols = set(nested_cols)
+    for row in rows:
+        for col, value in row.items():
+            if isinstance(value, (list, dict)):
+                nested_cols.add(col)
+
+    main_rows = []
+    child_rows = {col: [] for col in nested_cols}
+    for row in rows:
+        main_rows.append({col: value for col, value in row.items() if col not in nested_cols})
+        for col in nested_cols:
+            value = row.get(col)
+            if value is None:
+                continue
+            # a single dict or a scalar is one child row
+            if not isinstance(value, list):
+                value = [value]
+            for child in value:
+                child_row = dict(child) if isinstance(child, dict) else {'value': child}
+                child_row[parent_col] = row.get(id_col)
+                child_rows[col].append(child_row)
+
+    df = DataFrame(main_rows)
+    if len(df) > 0:
+        df = _add_uri(df, request_url, id_col)
+    children = {col: DataFrame(nested) for col, nested in child_rows.items()}
+    return df, children
+
+def _concat_frames(frames):
+    ''' Concatenates a list of (main, children) results of ``_response_to_frames``.
+        A column that is nested on any page is dropped from the main DataFrame,
+        pages without a nested value in it kept it as a plain column. '''
+    df = concat([main for main, _ in frames], ignore_index=True)
+    children = {}
+    for _, page_children in frames:
+        for col, child_df in page_children.items():
+            children.setdefault(col, []).append(child_df)
+    df = df.drop([col for col in children if col in df.columns], axis=1)
+    return df, {col: concat(dfs, ignore_index=True) for col, dfs in children.items()}
+
+def _collection_to_df(collection):
+    ''' Converts lists and dicts to DataFrame.
+        If neither a list nor a dict is found it
+        returns the unchanged argument
+    '''
+    if isinstance(collection, dict):
+        collection = [collection]
+    
+    if isinstance(collection, list):
+        try:
+            df = DataFrame(collection)
+        except:
+            raise
+        
+        return df
+    
+    else:
+        return collection
+
+
+def _add_uri(df, url, id_col='id', url_col='remote_url'):
+    
+    if id_col in df:
+        url = url.rstrip('/') + '/'
+        df[url_col] = [url + str(id) for id in df[id_col].tolist()]
+    
+    elif len(df.columns) == 0:
+        pass
+    
+    else:
+        raise KeyError('DataFrame doesnt have id column')
         
-        return df
\ No newline at end of file
+    return df
@@ -0,0 +1,143 @@
+import json
+import asyncio
+import aiohttp
+from requests import RequestException
+from pandas import concat
+
+from .hinterteil import _response_to_dataframe, _response_to_frames, _concat_frames
+
+
+class AsyncHinterteil(object):
+    '''
+        asyncio version of ``Hinterteil``, built on ``aiohttp``.
+        Methods are coroutines with the same arguments and results as the
+        ones of ``Hinterteil``, so many lookups can run concurrently from
+        one event loop:
+
+        >>> async with AsyncHinterteil(url) as db:
+        ...     events = await asyncio.gather(*[db.get_by_primary('event', i) for i in ids])
+
+        At most ``limit`` connections are open at the same time, further
+        requests wait for a free one. ``timeout`` is in seconds and applies
+        to every request, also on a passed in ``session``. Errors are raised
+        with the same exception types as ``Hinterteil``.
+    '''
+
+    def __init__(self, url, session=None, limit=100, timeout=10):
+        self.url = url
+        self.timeout = timeout
+        self._limit = limit
+        self._session = session
+
+    @property
+    def session(self):
+        # aiohttp wants its session created inside a running event loop
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self._limit)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    @property
+    def _client_timeout(self):
+        return aiohttp.ClientTimeout(total=self.timeout)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def get_by_primary(self, table_name, primary_key):
+        ''' Returns a dict representation of a table row by primary key. '''
+        return await self._get_json(self.url + table_name + '/' + str(primary_key))
+
+    async def get_single(self, table_name, value, field_name='primary'):
+        '''
+            Returns a single row of a table by looking for a match of `value`
+            in columns `field_name`. Wraps get_by_primary() for 'primary'.
+        '''
+        if field_name == 'primary':
+            return await self.get_by_primary(table_name, value)
+
+        query = {'filters': [{'name': field_name, 'op': '==', 'val': value}], 'single': True}
+        return await self._get_json(self.url + table_name, params={'q': json.dumps(query)})
+
+    async def append_child(self, table_name, item, field_name, child_payload):
+        '''
+            Adds a new item to a child table that has a 1:n relation to table_name.
+            Returns the parent item on success.
+        '''
+        payload = {field_name: {'add': [child_payload]}}
+        request_url = self.url + table_name + '/' + str(item['id'])
+        async with self.session.put(request_url, json=payload, timeout=self._client_timeout) as r:
+            if r.status >= 400:
+                raise RequestException(r.status, response=r)
+            return await r.json()
+
+    async def insert_dict(self, table_name, payload):
+        '''
+            Inserts a dict representation of a table row.
+            Returns the inserted dict if successful.
+            Raises RequestException otherwise.
+        '''
+        async with self.session.post(self.url + table_name, json=payload, timeout=self._client_timeout) as r:
+            status = str(r.status)
+            try:
+                response_dict = await r.json()
+            except (aiohttp.ContentTypeError, ValueError):
+                raise RequestException(status, response=r)
+
+            if r.status >= 400:
+                if isinstance(response_dict, dict) and 'message' in response_dict:
+                    raise RequestException(status + '/' + response_dict['message'], response=r)
+                raise RequestException(status, response=r)
+            return response_dict
+
+    async def get_df(self, table_name, item_id=None, query=None, all_pages=False,
+                     results_per_page=None, normalize=False):
+        '''
+            Requests a table and returns it as a pandas ``DataFrame``,
+            see ``Hinterteil.get_df``. With ``all_pages`` the remaining pages
+            are requested concurrently once the first one arrived.
+        '''
+        table_name = table_name.rstrip('/')
+        request_url = self.url + table_name
+        to_frames = _response_to_frames if normalize else _response_to_dataframe
+
+        if item_id:
+            resp_dict = await self._get_json(request_url + '/' + str(item_id))
+            return to_frames(resp_dict, request_url)
+
+        if not all_pages:
+            resp_dict = await self._get_page(request_url, query, None, results_per_page)
+            return to_frames(resp_dict, request_url)
+
+        first_page = await self._get_page(request_url, query, 1, results_per_page)
+        pages = range(2, first_page.get('total_pages', 1) + 1)
+        other_pages = await asyncio.gather(*[self._get_page(request_url, query, page, results_per_page)
+                                             for page in pages])
+        frames = [to_frames(resp_dict, request_url) for resp_dict in [first_page] + list(other_pages)]
+        if normalize:
+            return _concat_frames(frames)
+        return concat(frames, ignore_index=True)
+
+    async def _get_page(self, request_url, query=None, page=None, results_per_page=None):
+        params = {}
+        if query:
+            params['q'] = json.dumps(query)
+        if page is not None:
+            params['page'] = page
+        if results_per_page is not None:
+            params['results_per_page'] = results_per_page
+        return await self._get_json(request_url, params=params)
+
+    async def _get_json(self, request_url, params=None):
+        async with self.session.get(request_url, params=params, timeout=self._client_timeout) as r:
+            if r.status >= 400:
+                raise IOError(r.status)
+            return await r.json()
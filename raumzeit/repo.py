@@ -2,12 +2,35 @@ import py2neo
 from py2neo import Node, Relationship
 from py2neo.error import GraphError
 import re
+import warnings
 import hashlib
+import time
+from functools import lru_cache
 from unicodedata import normalize as uni_normalize
 from datetime import datetime, timedelta
 
+from .dates import parse_iso
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 _punct_re = re.compile(r"""[\t !"#$%&\'()*\-/<=>?@\[\\\]^_`{|},.]+""")
 
+_identifier_re = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+@lru_cache(maxsize=4096)
+def _slugify_text(text, delim, punct_re):
+    """ Turns text into a slug. Names repeat a lot during imports, so results are cached. """
+    ascii_text = uni_normalize('NFKD', text.lower()).encode('ascii', 'ignore').decode('ascii')
+    return delim.join(word for word in punct_re.split(ascii_text) if word)
+
+
+
+class SchemaWarning(UserWarning):
+    """ A uniqueness constraint could not be created. """
 
 
 class Repository(object):
@@ -38,16 +61,12 @@ class Repository(object):
             hash_key = hashlib.sha224(bytes).hexdigest()
             return hash_key
 
-        result = []
-        for word in punct_re.split(text.lower()):
-            word = uni_normalize('NFKD', word).encode('ascii', 'ignore')
-            if word:
-                result.append(word.decode('utf-8'))
+        slug = _slugify_text(text, delim, punct_re)
 
         if hash_dct:
-            result.append(calc_hash(hash_dct)[:hash_chars])
+            slug = delim.join(part for part in [slug, calc_hash(hash_dct)[:hash_chars]] if part)
 
-        return delim.join(result)
+        return slug
 
 class NeoRepository(Repository):
 
@@ -55,9 +74,45 @@ class NeoRepository(Repository):
                      ('Happening', 'Artist'): 'HOSTS'}
     REL_TO_ATTR = {'HAPPENS_AT': 'location', 'HOSTS': 'artists', 'LOCATED_AT': 'address'}
     ATTR_TO_REL = {v: k for k, v in REL_TO_ATTR.items()}
+    # properties that identify a node of a label, backed by uniqueness constraints
+    UNIQUE_PROPS = {'Location': 'slug', 'Artist': 'slug', 'Work': 'slug',
+                    'Happening': 'slug', 'URI': 'url'}
+
+    # uris of the graphs whose schema is known to be complete, checked once per process
+    _schema_ensured = set()
 
-    def __init__(self, graph):
+    def __init__(self, graph, ensure_schema=True):
         self._graph = graph
+        if ensure_schema and str(graph.uri) not in self._schema_ensured:
+            self.ensure_schema()
+
+    def missing_schema(self):
+        """ Returns the (label, property) pairs of UNIQUE_PROPS that are not
+            backed by a uniqueness constraint, and therefore not indexed, yet. """
+        missing = []
+        for label, prop in sorted(self.UNIQUE_PROPS.items()):
+            if prop not in self._graph.schema.get_uniqueness_constraints(label):
+                missing.append((label, prop))
+        return missing
+
+    def ensure_schema(self):
+        """ Creates the uniqueness constraints for UNIQUE_PROPS that don't exist yet.
+            Returns the (label, property) pairs that were created.
+            Constraints the graph refuses, e.g. because of duplicate values or an
+            index on the same property, are reported with a SchemaWarning. """
+        created, failed = [], []
+        for label, prop in self.missing_schema():
+            try:
+                self._graph.cypher.execute("""CREATE CONSTRAINT ON (n:{l}) ASSERT n.{p} IS UNIQUE""".format(l=label, p=prop))
+                created.append((label, prop))
+            except GraphError as exc:
+                failed.append('{l}.{p} ({e})'.format(l=label, p=prop, e=exc))
+
+        if failed:
+            warnings.warn("Couldn't create uniqueness constraints: " + ', '.join(failed), SchemaWarning)
+        else:
+            self._schema_ensured.add(str(self._graph.uri))
+        return created
 
     def iter_all_transaction(self, label):
         """ Deprecated"""
@@ -67,14 +122,41 @@ class NeoRepository(Repository):
         for record in record_stream:
             yield self._record_to_dict(record)
 
-    def iter_all(self, label):
-        for node in self._iter_all(label):
-            yield self._node_to_dict(node)
-
-    def _iter_all(self, label):
-        response = self._graph.find(label)
-        for node in response:
-            yield node
+    def iter_all(self, label, page_size=1000, props=None):
+        """ Iterate over all entities for a given label.
+            Entities are fetched in pages of `page_size` so memory use stays bounded.
+            If a list of `props` is passed only those properties are fetched. """
+        for record in self._iter_all(label, page_size, props):
+            if props is None:
+                yield self._node_to_dict(record.n)
+            else:
+                entity_dict = {prop: getattr(record, prop) for prop in props}
+                entity_dict['_label'] = label
+                yield entity_dict
+
+    def _iter_all(self, label, page_size=1000, props=None):
+        """ Iterate over the records of all nodes for a given label, page by page.
+            Pages are selected by a cursor on the node id rather than SKIP,
+            so nodes created while iterating don't shift the pages. """
+        if props is None:
+            columns = 'n'
+        else:
+            for prop in props:
+                if not _identifier_re.match(prop):
+                    raise ValueError('Not a valid property name: {p!r}'.format(p=prop))
+            columns = ', '.join('n.{p} AS {p}'.format(p=prop) for prop in props)
+        query = """MATCH (n:{l}) WHERE id(n) > {{cursor}}
+                   RETURN id(n) AS node_id, {c}
+                   ORDER BY node_id LIMIT {{page_size}}""".format(l=label, c=columns)
+
+        cursor = -1
+        while True:
+            records = self._graph.cypher.execute(query, parameters={'cursor': cursor, 'page_size': page_size})
+            for record in records:
+                yield record
+            if len(records) < page_size:
+                break
+            cursor = records[len(records) - 1].node_id
 
     def get_one(self, label, prop_key, prop_value):
         """ Get a unique enity that matches the query dictionary """
@@ -103,6 +185,71 @@ class NeoRepository(Repository):
         rel = self._graph.match_one(None, 'IDENTIFIED_BY', url_node)
         return rel.start_node
 
+    def _get_many(self, labels, slugs):
+        """ Get all nodes of any of `labels` whose slug is in `slugs` in a single query.
+            Returns a dict of (label, slug) to node. """
+        query = self._compile_get_many_query(labels)
+        records = self._graph.cypher.execute(query, parameters={'slugs': list(slugs)})
+        found = {}
+        for record in records:
+            found[(record.label, record.n.properties['slug'])] = record.n
+        return found
+
+    @classmethod
+    def _compile_get_many_query(cls, labels):
+        """ Compiles one labeled match per label, joined by UNION,
+            so each of them can use the index on the slug. """
+        return '\nUNION ALL\n'.join(
+            """MATCH (n:{l}) WHERE n.slug IN {{slugs}} RETURN '{l}' AS label, n""".format(l=label)
+            for label in labels)
+
+    def _existing_slugs(self, label, slugs):
+        """ Returns the subset of `slugs` that are already taken by nodes of `label`. """
+        query = """MATCH (n:{l}) WHERE n.slug IN {{slugs}} RETURN n.slug AS slug""".format(l=label)
+        records = self._graph.cypher.execute(query, parameters={'slugs': list(slugs)})
+        return set(record.slug for record in records)
+
+    def _existing_urls(self, urls):
+        """ Returns the subset of `urls` that are already taken by URI nodes. """
+        query = """MATCH (u:URI) WHERE u.url IN {urls} RETURN u.url AS url"""
+        records = self._graph.cypher.execute(query, parameters={'urls': list(urls)})
+        return set(record.url for record in records)
+
+    def _allocate_slugs(self, label, props_list):
+        """ Insert slugs into a batch of props dicts before anything is written.
+            A slug already taken in the graph or earlier in the batch gets a hash
+            of the props appended, and a counter if that is taken as well.
+            The plain and hashed slugs of the whole batch are checked in one query. """
+        plain_dcts = [self._with_slug(props) for props in props_list]
+        hashed_dcts = [self._with_slug(props, with_hash=True) for props in props_list]
+        taken = self._existing_slugs(label, [dct['slug'] for dct in plain_dcts + hashed_dcts])
+
+        entity_dcts = []
+        for plain_dct, hashed_dct in zip(plain_dcts, hashed_dcts):
+            if plain_dct['slug'] not in taken:
+                entity_dct = plain_dct
+            elif hashed_dct['slug'] not in taken:
+                entity_dct = hashed_dct
+            else:
+                entity_dct = self._with_counted_slug(label, hashed_dct, taken)
+            taken.add(entity_dct['slug'])
+            entity_dcts.append(entity_dct)
+        return entity_dcts
+
+    def _with_counted_slug(self, label, entity_dct, taken, batch_size=10):
+        """ Appends the lowest free counter to the slug of entity_dct.
+            Only needed for entities with identical props, so the graph is asked separately. """
+        first = 2
+        while True:
+            candidates = ['{s}-{n}'.format(s=entity_dct['slug'], n=n) for n in range(first, first + batch_size)]
+            unavailable = taken | self._existing_slugs(label, candidates)
+            for candidate in candidates:
+                if candidate not in unavailable:
+                    entity_dct = entity_dct.copy()
+                    entity_dct['slug'] = candidate
+                    return entity_dct
+            first += batch_size
+
     def get_joined(self, label, slug, rel_label, rel_attr, single_child=False):
         """ Returns an entity dict with another entity embedded in it """
         
@@ -116,6 +263,42 @@ class NeoRepository(Repository):
         
         return self.return_joined(parent_node, child_nodes, rel_attr, single_child)
 
+    def get_joined_many(self, label, slug, joins):
+        """ Returns an entity dict with several other entities embedded in it.
+            `joins` is a list of (rel_attr, rel_label, single_child) tuples.
+            All joins are resolved in a single query. """
+
+        query = self._compile_join_query(label, [rel_label for _, rel_label, _ in joins])
+        records = self._graph.cypher.execute(query, parameters={'slug': slug})
+        if len(records) == 0:
+            raise KeyError('No node with label {l} and slug={s}'.format(l=label, s=slug))
+        record = records[0]
+
+        parent_dict = self._node_to_dict(record.parent)
+        for i, (rel_attr, rel_label, single_child) in enumerate(joins):
+            child_nodes = getattr(record, 'joined_{i}'.format(i=i))
+            if len(child_nodes) == 0:
+                raise KeyError('Node {s} doesnt have rel {rel}'.format(s=slug, rel=rel_label))
+            if single_child:
+                parent_dict[rel_attr] = self._node_to_dict(child_nodes[0])
+            else:
+                parent_dict[rel_attr] = [self._node_to_dict(node) for node in child_nodes]
+        return parent_dict
+
+    @classmethod
+    def _compile_join_query(cls, label, rel_labels):
+        """ Compiles a query that matches a node by slug and collects
+            the neighbours for each relationship label into its own column. """
+        lines = ["MATCH (parent:{l} {{slug: {{slug}}}})".format(l=label)]
+        carried = ['parent']
+        for i, rel_label in enumerate(rel_labels):
+            column = 'joined_{i}'.format(i=i)
+            lines.append("OPTIONAL MATCH (parent)-[:{rel}]-(child_{i})".format(rel=rel_label, i=i))
+            lines.append("WITH {c}, collect(DISTINCT child_{i}) AS {col}".format(c=', '.join(carried), i=i, col=column))
+            carried.append(column)
+        lines.append("RETURN {c}".format(c=', '.join(carried)))
+        return '\n'.join(lines)
+
     def _get_joined(self, start_node, rel_label):
         """Moved"""
         
@@ -164,20 +347,17 @@ class NeoRepository(Repository):
         
     def _create_entity(self, label, props, links=None):
         """ Create a new sluggable entity. Must have a 'name' property. """
-        entity_dct = self._with_slug(props)
-        try:           
+        entity_dct, = self._allocate_slugs(label, [props])
+        try:
             node = self._create_node(label, entity_dct)
-
         except GraphError as exc:
-            if "already exists" in str(exc.args):
-                entity_dct = self._with_slug(props, with_hash=True)
-                node = self._create_node(label, entity_dct)
-            else:
-                raise exc
-
-        finally:
-            if links is not None:
-                self._create_uris(node, links)
+            # another writer took the slug since it was allocated
+            if "already exists" not in str(exc.args):
+                raise
+            entity_dct, = self._allocate_slugs(label, [props])
+            node = self._create_node(label, entity_dct)
+        if links is not None:
+            self._create_uris(node, links)
         return node
 
     def _create_uris(self, entity_node, url_dicts):
@@ -279,13 +459,8 @@ class EntityCollection(object):
         self._graph = neorepo._graph
 
     def get(self, slug, joins):
-        dct = {}
-        for attr in joins:
-            rel_label = self.RELS[attr][0]
-            single_child = self.RELS[attr][1]
-            joined_dct = self._repo.get_joined(self.label, slug, rel_label, attr, single_child)
-            dct.update(joined_dct)
-        return dct
+        planned_joins = [(attr, self.RELS[attr][0], self.RELS[attr][1]) for attr in joins]
+        return self._repo.get_joined_many(self.label, slug, planned_joins)
 
     def url_get(self, url):
         return self._repo.url_get(url)
@@ -442,18 +617,121 @@ class HappeningCollection(EntityCollection):
         except:
             raise
 
+    def create_many(self, records, chunk_size=500, read_back=True):
+        """ Create many happenings at once.
+            Each record is a dict with the arguments of `create`:
+            start, stop, props, location, artists and links.
+
+            All records are validated before anything is written, the timeline
+            is extended once and each chunk of records is written in a single
+            transaction. Returns the created happenings, or only their slugs
+            if `read_back` is False. """
+        records = list(records)
+        if len(records) == 0:
+            return []
+
+        mandatory_keys = {'record': ['start', 'stop', 'props', 'location', 'artists', 'links']}
+        for record in records:
+            self._validate(mandatory_keys, record=record)
+            self.validate(props=record['props'], artists=record['artists'],
+                          location=record['location'], links=record['links'])
+        self._check_unique_urls(records)
+        self._check_references(records)
+
+        self._timeline._extend_timeline(min(r['start'] for r in records),
+                                        max(r['stop'] for r in records))
+
+        entity_dcts = self._repo._allocate_slugs(self.label, [r['props'] for r in records])
+        rows = [self._compile_row(record, entity_dct) for record, entity_dct in zip(records, entity_dcts)]
+
+        for i in range(0, len(rows), chunk_size):
+            self._graph.cypher.execute(
+                """UNWIND {rows} AS row
+                   MATCH (loc: Location {slug: row.location})
+                   CREATE (loc)<-[:HAPPENS_AT]-(happ: Happening)
+                          -[:ACTIVE_DURING]->(t: Timespan {start: row.start, stop: row.stop})
+                   SET happ = row.props
+                   FOREACH (link IN row.links |
+                       CREATE (happ)-[:IDENTIFIED_BY]->(:URI {name: link.name, url: link.url}))
+                   WITH happ, t, row
+                   UNWIND row.hours AS hour
+                   MATCH (h: Hour {start: hour})
+                   CREATE (t)-[:OVERLAPS]->(h)
+                   WITH DISTINCT happ, row
+                   UNWIND row.artists AS artist_slug
+                   MATCH (a: Artist {slug: artist_slug})
+                   CREATE (happ)-[:HOSTS]->(a)
+                """, parameters={'rows': rows[i:i + chunk_size]})
+
+        slugs = [entity_dct['slug'] for entity_dct in entity_dcts]
+        if read_back:
+            return [self.get(slug) for slug in slugs]
+        return slugs
 
-    def iter_timeframe(self, start, stop):
-        params = self._timeline.compile_timeframe_params(start, stop)
-        happenings_iter = self._graph.cypher.stream(
-            """MATCH
+    @classmethod
+    def _check_unique_urls(cls, records):
+        """ URI urls are unique, so a batch linking the same url twice would fail part way through. """
+        seen = set()
+        for record in records:
+            for link in record['links']:
+                if link['url'] in seen:
+                    raise ValueError("Couldn't validate: url {u} is linked twice".format(u=link['url']))
+                seen.add(link['url'])
+
+    def _check_references(self, records):
+        """ Makes sure all artists and locations referenced by records exist, in one query,
+            and that none of the linked urls is taken in the graph yet, in another. """
+        wanted = set()
+        for record in records:
+            wanted.add(('Location', record['location']['slug']))
+            wanted.update(('Artist', a['slug']) for a in record['artists'])
+
+        found = self._repo._get_many(['Location', 'Artist'], set(slug for _, slug in wanted))
+        for label, slug in wanted:
+            if (label, slug) not in found:
+                raise KeyError('No node with label {l} and slug={s}'.format(l=label, s=slug))
+
+        taken = self._repo._existing_urls([link['url'] for record in records for link in record['links']])
+        if taken:
+            raise ValueError("Couldn't validate: url {u} already exists".format(u=sorted(taken)[0]))
+
+    def _compile_row(self, record, entity_dct):
+        """ Flattens a record into the parameters of the bulk insert query. """
+        tl = self._timeline
+        return {'props': entity_dct,
+                'location': record['location']['slug'],
+                'artists': [a['slug'] for a in record['artists']],
+                'links': [{'name': l['name'], 'url': l['url']} for l in record['links']],
+                'start': tl._dt_to_str(record['start']),
+                'stop': tl._dt_to_str(record['stop']),
+                'hours': tl._hour_strings(record['start'], record['stop'])}
+
+    # Queries for happenings active between the hours {start} and {stop}.
+    # 'range' uses the index on Hour.start that comes with its unique constraint,
+    # 'traversal' walks the NEXT chain of the timeline from {start} to {stop}.
+    TIMEFRAME_QUERIES = {
+        'range': """MATCH (h: Hour)
+                WHERE h.start >= {start} AND h.start <= {stop}
+                MATCH
+                happs = (h)<-[:OVERLAPS]-(t: Timespan)<-[:ACTIVE_DURING]-(happ: Happening),
+                happs_ext = (happ)-[:HAPPENS_AT]->(loc)
+                RETURN DISTINCT happ, t as time_, loc as location_
+            """,
+        'traversal': """MATCH
                 (h1: Hour {start: {start}}),
                 (h2: Hour {start: {stop}}),
                 active = (h1)-[:NEXT*0..]->(h: Hour)-[:NEXT*0..]->h2,
                 happs = (h)<-[:OVERLAPS]-(t: Timespan)<-[:ACTIVE_DURING]-(happ: Happening),
                 happs_ext = (happ)-[:HAPPENS_AT]->(loc)
                 RETURN DISTINCT happ, t as time_, loc as location_
-            """, parameters = params)
+            """}
+
+    def iter_timeframe(self, start, stop, mode='range'):
+        if mode not in self.TIMEFRAME_QUERIES:
+            raise ValueError('Unknown timeframe query mode {m}'.format(m=mode))
+        # 'range' compares hour strings and needs no existing hours at the ends
+        params = self._timeline.compile_timeframe_params(start, stop, clamp=(mode != 'range'))
+        happenings_iter = self._graph.cypher.stream(self.TIMEFRAME_QUERIES[mode], parameters = params)
         for record in happenings_iter:
             yield self._repo._record_to_dict(record)
 
@@ -468,9 +746,17 @@ class HappeningCollection(EntityCollection):
     
 class Timeline(object):
 
-    def __init__(self, graph):
+    # ranges of at least this many hours are built with numpy, if available
+    NUMPY_MIN_HOURS = 24 * 7
+
+    def __init__(self, graph, revalidate_after=None):
+        """ The earliest and latest hours of the timeline are cached in memory.
+            Pass `revalidate_after` (in seconds) if other processes extend the same
+            timeline, so the cached hours get re-read from the graph once they are that old. """
         
         self._graph = graph
+        self._revalidate_after = revalidate_after
+        self._boundaries = {}
         self._graph.cypher.execute("""CREATE CONSTRAINT ON (n:Hour) ASSERT n.start is UNIQUE""")
     
         index_nodes =  list(self._graph.find("HourIndex"))
@@ -489,46 +775,70 @@ class Timeline(object):
 
     @property 
     def latest(self):
-        latest_rel = self._graph.match_one(self.index, 'LATEST')
-        if latest_rel is None:
-            return None
-        else:
-            return latest_rel.end_node
+        return self._boundary('LATEST')
 
     @property 
     def earliest(self):
-        earliest_rel = self._graph.match_one(self.index, 'EARLIEST')
-        if earliest_rel is None:
-            return None
+        return self._boundary('EARLIEST')
+
+    def invalidate_boundaries(self):
+        """ Forget the cached earliest and latest hours. """
+        self._boundaries = {}
+
+    def _boundary(self, rel_label):
+        """ Returns the hour node the index points to with `rel_label`.
+            Only hits the graph if the hour is not cached or the cache is too old.
+            A missing hour is never cached, another process may create it. """
+        cached = self._boundaries.get(rel_label)
+        if cached is not None:
+            node, cached_at = cached
+            expired = (self._revalidate_after is not None and
+                       time.monotonic() - cached_at > self._revalidate_after)
+            if not expired:
+                return node
+
+        rel = self._graph.match_one(self.index, rel_label)
+        node = None if rel is None else rel.end_node
+        self._cache_boundary(rel_label, node)
+        return node
+
+    def _cache_boundary(self, rel_label, node):
+        if node is None:
+            self._boundaries.pop(rel_label, None)
         else:
-            return earliest_rel.end_node
+            self._boundaries[rel_label] = (node, time.monotonic())
     
-    def compile_timeframe_params(self, start, stop):
+    def compile_timeframe_params(self, start, stop, clamp=True):
         """ Compiles a dictionary used in a start-stop timeframe query.
-            Makes sure the params are within range of the timeline. """
+            With `clamp` the params are moved within range of the timeline, for
+            queries that start from existing hours. The boundaries are re-read
+            first if the timeframe reaches past the cached ones, as another
+            process may have extended the timeline since. """
         start = self._floor_dt(start)
         stop = self._floor_dt(stop)
-        
-        earliest = self._str_to_dt(self.earliest.properties['start'])
-        latest = self._str_to_dt(self.latest.properties['start'])
 
-        if start < earliest:
-            start = earliest
-        if stop > latest:
-            stop = latest
+        if clamp:
+            earliest, latest = self._boundary_dts()
+            if start < earliest or stop > latest:
+                self.invalidate_boundaries()
+                earliest, latest = self._boundary_dts()
+
+            if start < earliest:
+                start = earliest
+            if stop > latest:
+                stop = latest
 
         start_str, stop_str = start.isoformat(), stop.isoformat()
         return {'start': start_str, 'stop': stop_str}
 
+    def _boundary_dts(self):
+        return self._start_h_from_node(self.earliest), self._start_h_from_node(self.latest)
+
 
     def _init_hour(self, hour_datetime):
-        
+        """ Starts an empty timeline with a single hour. """
         floored = self._floor_dt(hour_datetime)
-        start = self._dt_to_str(floored)
-        hour_node = Node("Hour", start=start)
-        self._graph.create(hour_node)
-        self._set_latest(hour_node)
-        self._set_earliest(hour_node)
+        hour_node, _ = self._merge_hours(floored, floored)
         return hour_node
 
     def iter_timeframe(self, start, stop, node_label):
@@ -538,95 +848,115 @@ class Timeline(object):
         """ Create a timespan node and connect it to the hours on the timeline it overlaps. """
         
         self._extend_timeline(start, stop)
-        start_string, stop_string = self._dt_to_str(start), self._dt_to_str(stop)
-        timespan_node = Node('Timespan', start=start_string, stop=stop_string)
-        self._graph.create(timespan_node)
-        self._connect_timespan(timespan_node, start, stop)
-        self._graph.create(timespan_node)
+        params = {'start': self._dt_to_str(start),
+                  'stop': self._dt_to_str(stop),
+                  'hours': self._hour_strings(start, stop)}
+        records = self._graph.cypher.execute(
+            """CREATE (t: Timespan {start: {start}, stop: {stop}})
+               WITH t
+               UNWIND {hours} AS hour
+               OPTIONAL MATCH (h: Hour {start: hour})
+               WITH t, collect(h) AS hours
+               FOREACH (h IN hours | CREATE (t)-[:OVERLAPS]->(h))
+               RETURN t
+            """, parameters=params)
+        timespan_node = records[0].t
 
         return timespan_node
 
-    def _connect_timespan(self, timespan_node, start, stop):
-        """ Connects a timespan node with all the hours of the timeline it overlaps. """
-        hour_dts = self._hour_range(start, stop)
-        hour_strings = [self._dt_to_str(dt) for dt in hour_dts]
-        hour_nodes = [self._graph.find_one('Hour', 'start', start) for start in hour_strings] 
-        rels = [Relationship(timespan_node, 'OVERLAPS', hour_node) for hour_node in hour_nodes]
-        
-        self._graph.create(*rels)
-
     def _extend_timeline(self, start, stop):
         """Adds the timespan between start, stop to the timeline. Fills up gaps with hour nodes. """
-        if self.latest is None or self.earliest is None:
-            self._init_hour(start)
-
-        curr_latest_dt = self._start_h_from_node(self.latest)
-        if stop > curr_latest_dt:
-            self._append_hours(stop)
-
-        curr_earliest_dt = self._start_h_from_node(self.earliest)
-        if start < curr_earliest_dt:
-            self._prepend_hours(start)
-
-    def _append_hours(self, new_latest_dt):
-
-        old_latest_node = self.latest
-        old_latest_dt = self._start_h_from_node(old_latest_node)
-        
-        datetime_range = self._hour_range(old_latest_dt, new_latest_dt)
-        new_datetimes = datetime_range[1:]
-        strings = [self._dt_to_str(h) for h in new_datetimes]
-        new_nodes = [Node("Hour", start=h) for h in strings]
-
-        all_nodes = [old_latest_node] + new_nodes
-        neighbours = zip(all_nodes[:-1], all_nodes[1:])
-        rels = [Relationship(left, 'NEXT', right) for left, right in neighbours]
-        
-        new_entries = new_nodes + rels
-        self._graph.create(*new_entries)
-        self._set_latest(new_nodes[-1])
-
-    def _prepend_hours(self, new_earliest_dt):
+        start, stop = self._floor_dt(start), self._floor_dt(stop)
+        earliest, latest = self.earliest, self.latest
+        if earliest is not None and latest is not None:
+            # the timeline only grows, so a cached view covering the timespan is still right
+            if self._start_h_from_node(earliest) <= start and stop <= self._start_h_from_node(latest):
+                return
+        self._merge_hours(start, stop)
+
+    def _merge_hours(self, start, stop):
+        """ Merges the hours from start to stop into the timeline in one statement.
+            The run sent to the graph reaches into the cached timeline. The graph
+            only writes it if it touches the current earliest and latest hours, so
+            no gap is left when other writers moved them in the meantime. Existing
+            hours and NEXT relationships are reused and the index is moved to the
+            new boundaries. If the run missed the timeline it is rebuilt from the
+            boundaries the graph returned and sent again.
+            Returns the (earliest, latest) hour nodes of the timeline. """
+        while True:
+            earliest, latest = self._boundaries.get('EARLIEST'), self._boundaries.get('LATEST')
+            earliest_str = None if earliest is None else earliest[0].properties['start']
+            latest_str = None if latest is None else latest[0].properties['start']
+            hour_strings = self._run_to_merge(start, stop, earliest_str, latest_str)
+            if not hour_strings:
+                return earliest[0], latest[0]
+
+            record = self._graph.cypher.execute(
+                """MATCH (i: HourIndex)
+                   SET i._lock = true
+                   WITH i
+                   OPTIONAL MATCH (i)-[:EARLIEST]->(earliest: Hour)
+                   OPTIONAL MATCH (i)-[:LATEST]->(latest: Hour)
+                   WITH i, (earliest IS NULL OR latest IS NULL OR
+                            ({first} <= latest.start AND {last} >= earliest.start)) AS connected
+                   FOREACH (hour IN CASE WHEN connected THEN {hours} ELSE [] END |
+                       MERGE (:Hour {start: hour}))
+                   FOREACH (n IN CASE WHEN connected THEN range(0, size({hours}) - 2) ELSE [] END |
+                       MERGE (left: Hour {start: {hours}[n]})
+                       MERGE (right: Hour {start: {hours}[n + 1]})
+                       MERGE (left)-[:NEXT]->(right))
+                   WITH i, connected
+                   OPTIONAL MATCH (first_hour: Hour {start: {first}})
+                   OPTIONAL MATCH (i)-[old_earliest:EARLIEST]->(earliest: Hour)
+                   FOREACH (moved IN CASE WHEN connected AND (earliest IS NULL OR {first} < earliest.start) THEN [1] ELSE [] END |
+                       DELETE old_earliest
+                       CREATE (i)-[:EARLIEST]->(first_hour))
+                   WITH i, connected
+                   OPTIONAL MATCH (last_hour: Hour {start: {last}})
+                   OPTIONAL MATCH (i)-[old_latest:LATEST]->(latest: Hour)
+                   FOREACH (moved IN CASE WHEN connected AND (latest IS NULL OR {last} > latest.start) THEN [1] ELSE [] END |
+                       DELETE old_latest
+                       CREATE (i)-[:LATEST]->(last_hour))
+                   REMOVE i._lock
+                   WITH i, connected
+                   OPTIONAL MATCH (i)-[:EARLIEST]->(earliest: Hour)
+                   OPTIONAL MATCH (i)-[:LATEST]->(latest: Hour)
+                   RETURN connected, earliest, latest
+                """, parameters={'hours': hour_strings,
+                                 'first': hour_strings[0],
+                                 'last': hour_strings[-1]})[0]
+            self._cache_boundary('EARLIEST', record.earliest)
+            self._cache_boundary('LATEST', record.latest)
+            if record.connected:
+                return record.earliest, record.latest
 
-        old_earliest_node = self.earliest
-        old_earliest_dt = self._start_h_from_node(old_earliest_node)
-        
-        datetime_range = self._hour_range(new_earliest_dt, old_earliest_dt)
-        new_datetimes = datetime_range[:-1]
-        strings = [self._dt_to_str(h) for h in new_datetimes]
-        new_nodes = [Node("Hour", start=h) for h in strings]
-
-        all_nodes = new_nodes + [old_earliest_node]
-        neighbours = zip(all_nodes[:-1], all_nodes[1:])
-        rels = [Relationship(left, 'NEXT', right) for left, right in neighbours]
-        
-        new_entries = new_nodes + rels
-        self._graph.create(*new_entries)
-        self._set_earliest(new_nodes[0])
-
-    def _set_latest(self, latest_node):
-        old_rel = self._graph.match_one(self.index, 'LATEST')
-        self._graph.delete(old_rel)
-        rel = Relationship(self.index, 'LATEST', latest_node)
-        self._graph.create(rel)
-        return latest_node
-
-    def _set_earliest(self, earliest_node):
-        old_rel = self._graph.match_one(self.index, 'EARLIEST')
-        self._graph.delete(old_rel)
-        rel = Relationship(self.index, 'EARLIEST', earliest_node)
-        self._graph.create(rel)
-        return earliest_node
+    @classmethod
+    def _run_to_merge(cls, start, stop, earliest_str, latest_str):
+        """ Returns the hour strings to merge so that start to stop is covered
+            together with the timeline from earliest_str to latest_str. The run
+            starts or ends on an existing boundary hour, so it connects to the
+            timeline. Empty if the timeline already covers start to stop. """
+        if earliest_str is None or latest_str is None:
+            return cls._hour_strings(start, stop)
+        earliest, latest = cls._str_to_dt(earliest_str), cls._str_to_dt(latest_str)
+        if earliest <= start and stop <= latest:
+            return []
+        first = start if start < earliest else latest
+        last = stop if stop > latest else earliest
+        return cls._hour_strings(first, last)
 
     @classmethod
     def _hour_range(self, start_hour, end_hour=None, len_range=None):
         """ Creates a range of datetime objects of hours"""
+        return list(self._iter_hours(start_hour, end_hour, len_range))
+
+    @classmethod
+    def _iter_hours(self, start_hour, end_hour=None, len_range=None):
+        """ Lazily yields a range of datetime objects of hours"""
         
         start_hour = self._floor_dt(start_hour)
         if end_hour is not None:
-            end_hour = self._floor_dt(end_hour)
-            delta = end_hour - start_hour
-            num_hours = int((delta.days*24) + (delta.seconds/60/60))
+            num_hours = self._num_hours(start_hour, self._floor_dt(end_hour))
 
         elif len_range is not None:
             num_hours = len_range - 1
@@ -635,12 +965,38 @@ class Timeline(object):
             raise ValueError('Need either end_hour or len_range to compute hour range')
 
         one_hour = timedelta(0, 60*60)        
-        hours = [start_hour]
-        for i in range(num_hours):
-            last_hour = hours[-1]
-            next_hour = last_hour + one_hour
-            hours.append(next_hour)
-        return hours
+        hour = start_hour
+        for i in range(num_hours + 1):
+            yield hour
+            hour += one_hour
+
+    @classmethod
+    def _num_hours(self, start_hour, end_hour):
+        delta = end_hour - start_hour
+        return int((delta.days*24) + (delta.seconds/60/60))
+
+    @classmethod
+    def _iter_hour_strings(self, start_hour, end_hour):
+        """ Lazily yields the start strings of all hours between start_hour and end_hour """
+        for dt in self._iter_hours(start_hour, end_hour):
+            yield self._dt_to_str(dt)
+
+    @classmethod
+    def _hour_strings_np(self, start_hour, end_hour):
+        """ Creates the start strings of all hours between start_hour and end_hour with numpy """
+        start = np.datetime64(self._floor_dt(start_hour), 'h')
+        end = np.datetime64(self._floor_dt(end_hour), 'h')
+        hours = np.arange(start, end + 1, dtype='datetime64[h]')
+        return np.datetime_as_string(hours, unit='s').tolist()
+
+    @classmethod
+    def _hour_strings(self, start_hour, end_hour):
+        """ Creates a list of the start strings of all hours between start_hour and end_hour.
+            Long ranges are built with numpy if it is installed. """
+        start_hour, end_hour = self._floor_dt(start_hour), self._floor_dt(end_hour)
+        if np is not None and self._num_hours(start_hour, end_hour) >= self.NUMPY_MIN_HOURS:
+            return self._hour_strings_np(start_hour, end_hour)
+        return list(self._iter_hour_strings(start_hour, end_hour))
 
     @classmethod
     def _start_h_from_node(self, node_with_start):
@@ -653,13 +1009,11 @@ class Timeline(object):
 
     @classmethod
     def _str_to_dt(self, date_string):
-        return datetime.strptime(date_string, '%Y-%m-%dT%H:%M:%S')
+        return parse_iso(date_string)
 
     @classmethod
     def _floor_dt(self, dt):
         if dt.minute != 0 or dt.second != 0:
             dt = datetime(dt.year, dt.month, dt.day, dt.hour)
         return dt
-    
-
 
@@ -0,0 +1,21 @@
+from unittest.mock import MagicMock
+
+
+def make_response(json_dict, ok=True, status_code=200):
+    response = MagicMock(ok=ok, status_code=status_code)
+    response.json.return_value = json_dict
+    return response
+
+def make_paged_session(rows, per_page):
+    ''' A fake session serving `rows` in Flask-Restless pages of `per_page` rows. '''
+    total_pages = (len(rows) + per_page - 1) // per_page
+
+    def get(url, params=None, timeout=None):
+        page = (params or {}).get('page', 1)
+        objects = rows[(page - 1) * per_page:page * per_page]
+        return make_response({'objects': objects, 'page': page, 'total_pages': total_pages,
+                              'num_results': len(rows)})
+
+    session = MagicMock()
+    session.get.side_effect = get
+    return session
@@ -254,6 +254,59 @@ def test_create_multiple_happenings(happenings, artists, locations):
 
 
 
+def test_create_many_happenings(happenings, artists, locations):
+	artist = artists.create(make_props('artist_a'), [make_link('artist_a')])
+	location = locations.create(make_props('loc'), address, [make_link('loc')])
+
+	def make_record(name, start, stop, url=None):
+		return {'start': start, 'stop': stop, 'props': make_props(name), 'location': location,
+				'artists': [artist], 'links': [make_link(url or name)]}
+
+	records = [make_record('hap_a', make_dt(1, 1, 13), make_dt(1, 1, 15)),
+			   make_record('hap_b', make_dt(1, 1, 14), make_dt(1, 1, 16)),
+			   make_record('hap_a', make_dt(1, 1, 18), make_dt(1, 1, 20), 'hap_a_2')]
+
+	slugs = happenings.create_many(records, chunk_size=2, read_back=False)
+	assert slugs[:2] == ['hap-a', 'hap-b']
+	assert slugs[2].startswith('hap-a-')
+
+	assert has_sub_graph("""CREATE (m: Timespan {start: '2014-01-01T14:00:00', stop: '2014-01-01T16:00:00'})
+							<-[:ACTIVE_DURING]-(n: Happening {name: 'hap_b', slug: 'hap-b'})
+							-[:HAPPENS_AT]->(l: Location {name: 'loc', slug: 'loc'})
+							MERGE (o: Hour {start: '2014-01-01T15:00:00'})<-[:OVERLAPS]-(m)""")
+
+	happ = happenings.get('hap-b')
+	assert happ['location']['slug'] == 'loc'
+	assert happ['artists'][0]['slug'] == 'artist-a'
+	assert happ['links'][0]['url'] == 'hap_b'
+
+	created = happenings.create_many([make_record('hap_c', make_dt(1, 1, 10), make_dt(1, 1, 11))])
+	assert created[0]['slug'] == 'hap-c'
+	assert created[0]['time']['start'] == '2014-01-01T10:00:00'
+
+	with pytest.raises(KeyError):
+		bad_record = make_record('hap_d', make_dt(1, 1, 10), make_dt(1, 1, 11))
+		bad_record['location'] = {'slug': 'nowhere', '_label': 'Location'}
+		happenings.create_many([bad_record])
+
+	with pytest.raises(ValueError):
+		happenings.create_many([{'props': make_props('hap_e')}])
+
+	# the url of a URI node is unique, duplicates are rejected before anything is written
+	with pytest.raises(ValueError):
+		happenings.create_many([make_record('hap_f', make_dt(1, 1, 10), make_dt(1, 1, 11), 'hap_f'),
+								make_record('hap_g', make_dt(1, 1, 10), make_dt(1, 1, 11), 'hap_f')])
+	with pytest.raises(KeyError):
+		happenings.get('hap-f')
+
+	# urls already in the graph are rejected before the first chunk is written
+	with pytest.raises(ValueError):
+		happenings.create_many([make_record('hap_h', make_dt(1, 1, 10), make_dt(1, 1, 11), 'hap_h'),
+								make_record('hap_i', make_dt(1, 1, 10), make_dt(1, 1, 11), 'hap_b')],
+							   chunk_size=1)
+	with pytest.raises(KeyError):
+		happenings.get('hap-h')
+
 def test_get_happening(happenings, locations, artists):
     artist_a = artists.create(artist_props, [{'name':'foo', 'url':'bar'}])
     artist_b = artists.create({'name': 'DJ2'}, [{'name':'foo', 'url':'baz'}])
@@ -308,3 +361,18 @@ def test_get_happening_timespan(happenings_filled):
 	assert last['location']['slug'] == 'loc'
 	assert last['location']['_label'] == 'Location'
 
+def test_get_happening_timespan_modes(happenings_filled):
+	happenings = happenings_filled
+
+	def slugs(mode, start, stop):
+		return sorted(h['slug'] for h in happenings.iter_timeframe(start, stop, mode=mode))
+
+	for start, stop in [(make_dt(1, 1, 13), make_dt(1, 1, 15)),
+						(make_dt(1, 1, 15), make_dt(1, 1, 17)),
+						(make_dt(1, 1, 17), make_dt(1, 1, 22))]:
+		assert slugs('range', start, stop) == slugs('traversal', start, stop)
+
+	assert slugs('range', make_dt(1, 1, 17), make_dt(1, 1, 22)) == ['hap-c']
+
+	with pytest.raises(ValueError):
+		list(happenings.iter_timeframe(make_dt(1, 1, 13), make_dt(1, 1, 15), mode='foo'))
@@ -0,0 +1,209 @@
+from raumzeit.hinterteil import Hinterteil, ResponseCache
+from requests import RequestException, Timeout
+import json
+import time
+import pytest
+from unittest.mock import MagicMock
+
+from .fake_hinterteil import make_response, make_paged_session
+
+URL = 'http://localhost:5000/api/'
+
+
+def test_session_init():
+    db = Hinterteil(URL, pool_size=4, timeout=3, retries=2)
+    adapter = db.session.get_adapter(URL)
+    assert adapter._pool_maxsize == 4
+    assert adapter.max_retries.total == 2
+    assert adapter.max_retries.allowed_methods == frozenset(['GET'])
+    assert db.timeout == 3
+    db.close()
+
+def test_requests_use_session():
+    session = MagicMock()
+    session.get.return_value = make_response({'id': 1, 'name': 'EventA'})
+    db = Hinterteil(URL, session=session, timeout=5)
+
+    assert db.get_by_primary('event', '1')['name'] == 'EventA'
+    session.get.assert_called_once_with(URL + 'event/1', timeout=5)
+
+    session.get.return_value = make_response({}, ok=False, status_code=404)
+    with pytest.raises(IOError):
+        db.get_single('third_party', 'thirdPartyA', 'name')
+
+def make_venues(num_rows):
+    return [{'id': i, 'name': 'venue{i}'.format(i=i)} for i in range(num_rows)]
+
+def test_get_df_first_page():
+    db = Hinterteil(URL, session=make_paged_session(make_venues(10), 4))
+    df = db.get_df('venue')
+    assert list(df['id']) == [0, 1, 2, 3]
+    assert df['remote_url'][0] == URL + 'venue/0'
+
+def test_get_df_all_pages():
+    for workers in [1, 3]:
+        session = make_paged_session(make_venues(10), 4)
+        db = Hinterteil(URL, session=session)
+        df = db.get_df('venue', query={'filters': []}, all_pages=True, results_per_page=4, workers=workers)
+        assert list(df['id']) == list(range(10))
+        assert list(df['remote_url']) == [URL + 'venue/{i}'.format(i=i) for i in range(10)]
+        assert session.get.call_count == 3
+        params = session.get.call_args[1]['params']
+        assert params['results_per_page'] == 4
+        assert 'q' in params
+
+def test_iter_df():
+    db = Hinterteil(URL, session=make_paged_session(make_venues(10), 4))
+    frames = list(db.iter_df('venue', workers=2))
+    assert [len(df) for df in frames] == [4, 4, 2]
+
+def test_get_df_normalized():
+    events = [{'id': 1, 'name': 'EventA', 'venue': {'id': 7, 'name': 'kater'},
+               'performances': [{'id': 10, 'name': 'perfA'}, {'id': 11, 'name': 'perfB'}]},
+              {'id': 2, 'name': 'EventB', 'venue': None, 'performances': []}]
+    session = MagicMock()
+    session.get.return_value = make_response({'objects': events, 'page': 1, 'total_pages': 1})
+    db = Hinterteil(URL, session=session)
+
+    df, children = db.get_df('event', normalize=True)
+    assert list(df.columns) == ['id', 'name', 'remote_url']
+    assert list(df['remote_url']) == [URL + 'event/1', URL + 'event/2']
+    assert set(children.keys()) == set(['venue', 'performances'])
+    assert list(children['venue']['parent_id']) == [1]
+    assert list(children['performances']['name']) == ['perfA', 'perfB']
+    assert list(children['performances']['parent_id']) == [1, 1]
+
+    df, children = db.get_df('event', all_pages=True, normalize=True)
+    assert len(df) == 2
+    assert len(children['performances']) == 2
+
+def test_get_df_normalized_mixed_scalars():
+    events = [{'id': 1, 'tags': ['techno', 'house']},
+              {'id': 2, 'tags': 'disco'},
+              {'id': 3, 'tags': 5},
+              {'id': 4, 'tags': None}]
+    session = MagicMock()
+    session.get.return_value = make_response({'objects': events, 'page': 1, 'total_pages': 1})
+    db = Hinterteil(URL, session=session)
+
+    df, children = db.get_df('event', normalize=True)
+    assert list(children['tags']['value']) == ['techno', 'house', 'disco', 5]
+    assert list(children['tags']['parent_id']) == [1, 1, 2, 3]
+
+def test_get_df_normalized_across_pages():
+    # the venue relation is only set on the second and third page
+    events = [{'id': 1, 'venue': None}, {'id': 2, 'venue': None},
+              {'id': 3, 'venue': {'id': 7, 'name': 'kater'}}, {'id': 4, 'venue': None},
+              {'id': 5, 'venue': None}]
+    db = Hinterteil(URL, session=make_paged_session(events, 2))
+
+    df, children = db.get_df('event', all_pages=True, normalize=True)
+    assert list(df.columns) == ['id', 'remote_url']
+    assert list(children['venue']['parent_id']) == [3]
+
+    frames = list(db.iter_df('event', normalize=True))
+    assert 'venue' in frames[0][0].columns
+    assert [list(main.columns) for main, _ in frames[1:]] == [['id', 'remote_url']] * 2
+
+def test_insert_many():
+    def post(url, data=None, headers=None, timeout=None):
+        payload = json.loads(data)
+        if isinstance(payload, list):
+            return make_response({'message': 'lists not supported'}, ok=False, status_code=400)
+        if payload['name'] == 'bad':
+            return make_response({'message': 'bad row'}, ok=False, status_code=400)
+        payload['id'] = 1
+        return make_response(payload)
+
+    session = MagicMock()
+    session.post.side_effect = post
+    db = Hinterteil(URL, session=session)
+
+    payloads = [{'name': 'tpA'}, {'name': 'bad'}, {'name': 'tpC'}]
+    for bulk in [False, True]:
+        results = db.insert_many('third_party', payloads, bulk=bulk, workers=2)
+        assert [row['name'] for row, exc in results if exc is None] == ['tpA', 'tpC']
+        assert results[1][0] is None
+        assert isinstance(results[1][1], RequestException)
+
+def test_insert_many_bulk():
+    session = MagicMock()
+    session.post.return_value = make_response({'objects': [{'id': 1}, {'id': 2}]})
+    db = Hinterteil(URL, session=session)
+
+    results = db.insert_many('third_party', [{'name': 'tpA'}, {'name': 'tpB'}], bulk=True)
+    assert results == [({'id': 1}, None), ({'id': 2}, None)]
+    assert session.post.call_count == 1
+
+def test_append_children():
+    event = {'id': 2, 'performances': []}
+    session = MagicMock()
+    session.put.return_value = make_response({'id': 2, 'performances': [{'id': 1}, {'id': 2}]})
+    db = Hinterteil(URL, session=session)
+
+    results = db.append_children('event', event, 'performances', [{'name': 'perfA'}, {'name': 'perfB'}])
+    assert len(results) == 2
+    assert all(exc is None for parent, exc in results)
+    assert session.put.call_count == 1
+    assert json.loads(session.put.call_args[1]['data'])['performances']['add'][1]['name'] == 'perfB'
+
+    session.put.return_value = make_response({}, ok=False, status_code=400)
+    results = db.append_children('event', event, 'performances', [{'name': 'perfA'}, {'name': 'perfB'}])
+    assert all(isinstance(exc, IOError) for parent, exc in results)
+    assert session.put.call_count == 4
+
+def test_response_cache():
+    cache = ResponseCache(maxsize=2, ttl=60)
+    assert cache.get('event', 1) is None
+    cache.put('event', 1, {'id': 1})
+    cache.put('event', 2, {'id': 2})
+    assert cache.get('event', 1) == {'id': 1}
+    cache.put('artist', 1, {'id': 1})
+    # event 2 was the least recently used
+    assert cache.get('event', 2) is None
+    assert cache.get('artist', 1) == {'id': 1}
+    assert (cache.hits, cache.misses) == (2, 2)
+
+    cache.invalidate('artist')
+    assert cache.get('artist', 1) is None
+    assert cache.get('event', 1) == {'id': 1}
+
+    cache = ResponseCache(ttl=0)
+    cache.put('event', 1, {'id': 1})
+    time.sleep(0.01)
+    assert cache.get('event', 1) is None
+
+def test_cached_reads():
+    session = MagicMock()
+    session.get.return_value = make_response({'id': 1, 'name': 'PerformanceKindA'})
+    session.post.return_value = make_response({'id': 2, 'name': 'PerformanceKindB'})
+    cache = ResponseCache()
+    db = Hinterteil(URL, session=session, cache=cache)
+
+    for _ in range(3):
+        db.get_by_primary('performance_kind', '1')
+        db.get_single('performance_kind', 'PerformanceKindA', 'name')
+    assert session.get.call_count == 2
+    assert (cache.hits, cache.misses) == (4, 2)
+
+    db.insert_dict('performance_kind', {'name': 'PerformanceKindB'})
+    db.get_by_primary('performance_kind', '1')
+    assert session.get.call_count == 3
+
+def test_bulk_writes_dont_resend_after_timeouts():
+    session = MagicMock()
+    session.post.side_effect = Timeout('read timed out')
+    session.put.side_effect = Timeout('read timed out')
+    db = Hinterteil(URL, session=session)
+
+    with pytest.raises(Timeout):
+        db.insert_many('third_party', [{'name': 'tpA'}, {'name': 'tpB'}], bulk=True)
+    assert session.post.call_count == 1
+
+    with pytest.raises(Timeout):
+        db.append_children('event', {'id': 2}, 'performances', [{'name': 'perfA'}, {'name': 'perfB'}])
+    assert session.put.call_count == 1
+
+    # one by one, the timeout is reported for each row
+    results = db.insert_many('third_party', [{'name': 'tpA'}, {'name': 'tpB'}])
+    assert all(isinstance(exc, Timeout) for row, exc in results)
@@ -0,0 +1,98 @@
+import asyncio
+import pytest
+from requests import RequestException
+
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from raumzeit.hinterteil_async import AsyncHinterteil
+
+EVENTS = [{'id': i, 'name': 'Event{i}'.format(i=i)} for i in range(5)]
+
+
+def make_app():
+    async def get_event(request):
+        return web.json_response(EVENTS[int(request.match_info['id'])])
+
+    async def get_events(request):
+        page = int(request.query.get('page', 1))
+        objects = EVENTS[(page - 1) * 2:page * 2]
+        return web.json_response({'objects': objects, 'page': page, 'total_pages': 3})
+
+    async def post_event(request):
+        payload = await request.json()
+        if 'name' not in payload:
+            return web.json_response({'message': 'no name'}, status=400)
+        payload['id'] = 99
+        return web.json_response(payload, status=201)
+
+    async def put_event(request):
+        payload = await request.json()
+        if 'performances' not in payload:
+            return web.json_response({'message': 'no performances'}, status=400)
+        event = dict(EVENTS[int(request.match_info['id'])])
+        event['performances'] = payload['performances']['add']
+        return web.json_response(event)
+
+    async def get_slow(request):
+        await asyncio.sleep(1)
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_get('/api/event/{id}', get_event)
+    app.router.add_put('/api/event/{id}', put_event)
+    app.router.add_get('/api/event', get_events)
+    app.router.add_post('/api/event', post_event)
+    app.router.add_get('/api/slow/{id}', get_slow)
+    return app
+
+def run_with_client(test, own_session=False, **kwargs):
+    async def run():
+        server = TestServer(make_app())
+        await server.start_server()
+        try:
+            session = aiohttp.ClientSession() if own_session else None
+            async with AsyncHinterteil(str(server.make_url('/api/')), session=session, limit=3, **kwargs) as db:
+                await test(db)
+        finally:
+            await server.close()
+    asyncio.run(run())
+
+def test_get_by_primary():
+    async def test(db):
+        events = await asyncio.gather(*[db.get_by_primary('event', i) for i in range(5)])
+        assert [e['name'] for e in events] == [e['name'] for e in EVENTS]
+        with pytest.raises(IOError):
+            await db.get_by_primary('nothing', 1)
+    run_with_client(test)
+
+def test_get_df():
+    async def test(db):
+        df = await db.get_df('event')
+        assert list(df['id']) == [0, 1]
+        df = await db.get_df('event', all_pages=True)
+        assert list(df['id']) == list(range(5))
+        assert df['remote_url'][4].endswith('/api/event/4')
+    run_with_client(test)
+
+def test_insert_and_append():
+    async def test(db):
+        inserted = await db.insert_dict('event', {'name': 'EventX'})
+        assert inserted['id'] == 99
+        with pytest.raises(RequestException) as exc:
+            await db.insert_dict('event', {'foo': 'bar'})
+        assert 'no name' in str(exc.value)
+
+        event = await db.append_child('event', EVENTS[1], 'performances', {'name': 'perfA'})
+        assert event['performances'] == [{'name': 'perfA'}]
+        with pytest.raises(RequestException) as exc:
+            await db.append_child('event', EVENTS[1], 'artists', {'name': 'artistA'})
+        assert exc.value.response.status == 400
+    run_with_client(test)
+
+def test_timeout_on_passed_session():
+    async def test(db):
+        with pytest.raises(asyncio.TimeoutError):
+            await db.get_by_primary('slow', 1)
+    run_with_client(test, own_session=True, timeout=0.1)
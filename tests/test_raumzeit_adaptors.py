@@ -1,10 +1,100 @@
-from nose2.tools import *
-
 from raumzeit.adaptors import HinterteilAdaptor
+from raumzeit.core import Location
+from unittest.mock import MagicMock
+from datetime import datetime
+import json
+
+from .fake_hinterteil import make_response, make_paged_session
+
+URL = 'http://localhost:5000/api/'
+
+
+def make_venues(num_rows):
+    return [{'id': i, 'name': 'venue{i}'.format(i=i), 'lat': 52.5, 'lon': 13.4,
+             'adress_string': 'Somestreet {i}'.format(i=i), 'description': None}
+            for i in range(num_rows)]
+
+def test_hinterteil_adaptor():
+    session = make_paged_session(make_venues(5), 2)
+    db = HinterteilAdaptor(URL, session=session)
+
+    locations = db.get_locations()
+    first = next(locations)
+    assert isinstance(first, Location)
+    # locations are yielded before the following pages are requested
+    assert session.get.call_count == 1
+    assert first.name == 'venue0'
+    assert (first.lat, first.lon) == (52.5, 13.4)
+    assert first.address == 'Somestreet 0'
+    assert first._db_info == {'table': 'venue', 'id': 0}
+
+    assert [l.name for l in locations] == ['venue{i}'.format(i=i) for i in range(1, 5)]
+    assert session.get.call_count == 3
+
+def make_event_session(events, venues=()):
+    venue_session = make_paged_session(list(venues), 2)
+
+    def get(url, params=None, timeout=None):
+        if url.endswith('venue'):
+            return venue_session.get(url, params=params, timeout=timeout)
+        query = json.loads(params['q'])
+        filters = {f['name']: f['val'] for f in query['filters']}
+        objects = [e for e in events
+                   if e['start_datetime'] < filters['start_datetime']
+                   and e['end_datetime'] > filters['end_datetime']
+                   and ('venue_id' not in filters or e['venue_id'] in filters['venue_id'])]
+        return make_response({'objects': objects, 'page': 1, 'total_pages': 1})
+
+    session = MagicMock()
+    session.get.side_effect = get
+    return session
+
+def test_get_happenings():
+    events = [{'id': 1, 'name': 'partyA', 'venue_id': 1,
+               'start_datetime': '2014-01-01T22:00:00', 'end_datetime': '2014-01-02T08:00:00'},
+              {'id': 2, 'name': 'partyB', 'venue_id': 2,
+               'start_datetime': '2014-01-02T23:00:00', 'end_datetime': '2014-01-03T10:00:00.500000'},
+              {'id': 3, 'name': 'partyC', 'venue_id': 1,
+               'start_datetime': '2014-02-01T22:00:00', 'end_datetime': '2014-02-02T08:00:00'}]
+    session = make_event_session(events)
+    db = HinterteilAdaptor(URL, session=session)
+    kater = Location('kater', 52.5, 13.4, 'kater', {'table': 'venue', 'id': 1})
+    renate = Location('renate', 52.5, 13.4, 'renate', {'table': 'venue', 'id': 2})
+    after, before = datetime(2014, 1, 1), datetime(2014, 1, 31)
+
+    happenings = list(db.get_happenings(kater, after, before))
+    assert [h.name for h in happenings] == ['partyA']
+    assert happenings[0].start == datetime(2014, 1, 1, 22)
+    assert happenings[0].location is kater
+    assert happenings[0]._db_info == {'table': 'event', 'id': 1}
+
+    grouped = db.get_happenings_by_location(after, before, [kater, renate])
+    assert session.get.call_count == 2
+    assert sorted(grouped) == [1, 2]
+    assert grouped[2][0].end == datetime(2014, 1, 3, 10)
+    assert grouped[2][0].location is renate
+
+    grouped = db.get_happenings_by_location(after, datetime(2014, 3, 1))
+    assert [h.name for h in grouped[1]] == ['partyA', 'partyC']
+    assert grouped[1][0].location is None
+
+def test_active_happenings_bulk():
+    events = [{'id': 1, 'name': 'partyA', 'venue_id': 1,
+               'start_datetime': '2014-01-01T22:00:00', 'end_datetime': '2014-01-02T08:00:00'},
+              {'id': 2, 'name': 'partyB', 'venue_id': 2,
+               'start_datetime': '2014-01-02T23:00:00', 'end_datetime': '2014-01-03T10:00:00'}]
+    session = make_event_session(events, make_venues(3))
+    db = HinterteilAdaptor(URL, session=session)
+    after, before = datetime(2014, 1, 1), datetime(2014, 1, 31)
+
+    happenings = list(db.active_happenings_bulk(after, before))
+    assert [(h.name, h.location.name) for h in happenings] == [('partyA', 'venue1'), ('partyB', 'venue2')]
+    # one events request plus the two pages of venues
+    assert session.get.call_count == 3
 
-# def test_hinterteil_adaptor():
-#     db = HinterteilAdaptor('http://localhost:5000/api/')
-    
-#     locations = db.get_locations()
-#     first = next(locations)
-#     assert isinstance(first, Location)
\ No newline at end of file
+    # the venues are known now, every further view is a single request
+    session.get.reset_mock()
+    happenings = list(db.active_happenings_bulk(datetime(2014, 1, 2, 12), before))
+    assert [h.name for h in happenings] == ['partyB']
+    assert happenings[0].location is db.locations[2]
+    assert session.get.call_count == 1
@@ -1,6 +1,7 @@
 import pytest
-from raumzeit.core import Location, Happening, Person, timespans_overlap, in_timespan
-from datetime import datetime
+from raumzeit.core import Location, Happening, Person, HappeningIndex, timespans_overlap, in_timespan
+from datetime import datetime, timedelta
+import random
 from unittest.mock import patch
     
 def init_location():
@@ -120,3 +121,47 @@ def test_in_timespan():
     assert in_timespan(a, feb[0], feb[1]) == False
     assert in_timespan(b, jan[0], jan[1]) == True
     assert in_timespan(b, feb[0], feb[1]) == True
+
+def test_happening_index():
+    rnd = random.Random(1)
+    base = datetime(2014, 1, 1)
+    happenings = []
+    for i in range(300):
+        start = base + timedelta(hours=rnd.randrange(24 * 60))
+        happenings.append(Happening(str(i), start, start + timedelta(hours=rnd.randrange(1, 72)), None, None))
+    index = HappeningIndex(happenings)
+    assert len(index) == 300
+    assert [h.start for h in index] == sorted(h.start for h in happenings)
+
+    def brute_force(start, end):
+        return sorted((h for h in happenings if in_timespan(h, start, end)), key=lambda h: h.start)
+
+    for _ in range(50):
+        start = base + timedelta(hours=rnd.randrange(-48, 24 * 62))
+        end = start + timedelta(hours=rnd.randrange(1, 24 * 7))
+        assert set(index.overlapping(start, end)) == set(brute_force(start, end))
+        starts = [h.start for h in index.overlapping(start, end)]
+        assert starts == sorted(starts)
+
+    for h in happenings[::2]:
+        index.remove(h)
+    happenings = happenings[1::2]
+    assert len(index) == 150
+    assert set(index.overlapping(base, base + timedelta(days=30))) == set(brute_force(base, base + timedelta(days=30)))
+
+    with pytest.raises(KeyError):
+        index.remove(Happening('x', base, base + timedelta(hours=1), None, None))
+
+def test_happening_index_half_open():
+    a = Happening('a', datetime(2014, 1, 1), datetime(2014, 1, 7), None, None)
+    index = HappeningIndex([a])
+    index.insert(a)
+    assert len(index) == 1
+    assert index.overlapping(datetime(2014, 1, 7), datetime(2014, 1, 8)) == []
+    assert index.overlapping(datetime(2013, 12, 1), datetime(2014, 1, 1)) == []
+    assert index.overlapping(datetime(2014, 1, 6), datetime(2014, 1, 8)) == [a]
+
+    with pytest.raises(ValueError):
+        index.overlapping(datetime(2014, 1, 8), datetime(2014, 1, 6))
+    with pytest.raises(ValueError):
+        index.insert(Happening('b', datetime(2014, 1, 8), datetime(2014, 1, 6), None, None))
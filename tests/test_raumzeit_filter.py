@@ -78,3 +78,120 @@
     
 
 
+
+from raumzeit.core import Location, Happening, Person, in_timespan
+from raumzeit.filters import TimeAwareLayer
+from datetime import datetime
+
+
+class FakeEntityGenerator(object):
+    """Serves happenings per location, counting the calls."""
+
+    def __init__(self):
+        self.locs = [Location('a', 51.1, 3.1, 'kater', 'dbinfo'),
+                     Location('b', 51.1, 3.1, 'renate', 'dbinfo'),
+                     Location('c', 51.1, 3.1, 'kater2', 'dbinfo')]
+        self.haps = [Happening('party_a', datetime(2014, 1, 1), datetime(2014, 1, 2), 'party_a', 'dbinfo'),
+                     Happening('party_b', datetime(2014, 6, 21), datetime(2014, 6, 22), 'party_b', 'dbinfo'),
+                     Happening('party_c', datetime(2014, 1, 10), datetime(2014, 2, 28), 'party_c', 'dbinfo'),
+                     Happening('party_d', datetime(2014, 2, 6), datetime(2014, 2, 8), 'party_d', 'dbinfo')]
+        for h, l in zip(self.haps, [0, 0, 1, 2]):
+            self.locs[l].add_happening(h)
+        self.calls = 0
+
+    def all_locations(self):
+        return iter(self.locs)
+
+    def active_happenings(self, location, start, end):
+        self.calls += 1
+        return (h for h in location.happenings if in_timespan(h, start, end))
+
+    def subhappenings(self, happening):
+        yield Person(happening.name + '-dj1', happening.name + '-dj1', 'dbinfo')
+
+
+class FakeBulkEntityGenerator(FakeEntityGenerator):
+
+    def active_happenings_bulk(self, start, end):
+        self.calls += 1
+        return [h for h in self.haps if in_timespan(h, start, end)]
+
+
+def test_timeawarelayer_active_locations():
+    for generator in [FakeEntityGenerator(), FakeBulkEntityGenerator()]:
+        timelayer = TimeAwareLayer(generator)
+        timelayer.set_timespan(datetime(2014, 1, 1), datetime(2014, 1, 20))
+
+        assert [l.slug for l in timelayer._active_locations()] == ['kater', 'renate']
+        assert [h.name for h in timelayer._all_active_happenings()] == ['party_a', 'party_c']
+
+        result = [(location.slug, [(h.name, [p.name for p in subs]) for h, subs in happenings_subs])
+                  for location, happenings_subs in timelayer.active_locations_happenings()]
+        assert result == [('kater', [('party_a', ['party_a-dj1'])]),
+                          ('renate', [('party_c', ['party_c-dj1'])])]
+
+def test_timeawarelayer_location_order():
+    # locations are ordered by their first happening, with and without the bulk hook
+    for generator in [FakeEntityGenerator(), FakeBulkEntityGenerator()]:
+        generator.haps.reverse()
+        for location in generator.locs:
+            location.happenings.reverse()
+        timelayer = TimeAwareLayer(generator)
+        timelayer.set_timespan(datetime(2014, 1, 1), datetime(2014, 7, 1))
+
+        assert [l.slug for l in timelayer._active_locations()] == ['kater', 'renate', 'kater2']
+        assert [h.name for h in timelayer._all_active_happenings()] == ['party_a', 'party_b', 'party_c', 'party_d']
+
+def test_timeawarelayer_bulk_single_query():
+    generator = FakeBulkEntityGenerator()
+    timelayer = TimeAwareLayer(generator)
+    timelayer.set_timespan(datetime(2014, 2, 1), datetime(2014, 7, 1))
+
+    assert [l.slug for l in timelayer._active_locations()] == ['renate', 'kater2', 'kater']
+    assert generator.calls == 1
+
+def test_timeawarelayer_timespan_cache():
+    generator = FakeBulkEntityGenerator()
+    timelayer = TimeAwareLayer(generator, cache_size=2)
+    jan = (datetime(2014, 1, 1), datetime(2014, 1, 20))
+    feb = (datetime(2014, 2, 1), datetime(2014, 2, 20))
+    jun = (datetime(2014, 6, 1), datetime(2014, 6, 30))
+
+    timelayer.set_timespan(*jan)
+    timelayer.set_timespan(*feb)
+    timelayer.set_timespan(*jan)
+    assert generator.calls == 2
+    assert [h.name for h in timelayer._all_active_happenings()] == ['party_a', 'party_c']
+
+    # feb was the least recently used timespan
+    timelayer.set_timespan(*jun)
+    timelayer.set_timespan(*feb)
+    assert generator.calls == 4
+    assert [l.slug for l in timelayer._active_locations()] == ['renate', 'kater2']
+
+    timelayer.invalidate(*feb)
+    assert generator.calls == 5
+    timelayer.invalidate()
+    timelayer.set_timespan(*jun)
+    assert generator.calls == 7
+
+def test_local_querier():
+    from raumzeit.collections import LocalQuerier, Happenings, Locations
+
+    generator = FakeEntityGenerator()
+    querier = LocalQuerier(generator.locs)
+    kater, renate, kater2 = generator.locs
+    jan = (datetime(2014, 1, 1), datetime(2014, 1, 20))
+
+    assert [h.name for h in Happenings(querier).filter_by_date(kater, *jan)] == ['party_a']
+    locations = Locations(generator.locs)
+    locations.set_happenings(Happenings(querier))
+    assert [l.slug for l in locations.all_active(*jan)] == ['kater', 'renate']
+
+    timelayer = TimeAwareLayer(querier)
+    timelayer.set_timespan(datetime(2014, 2, 1), datetime(2014, 7, 1))
+    assert [l.slug for l in timelayer._active_locations()] == ['renate', 'kater2', 'kater']
+
+    querier.remove_happening(generator.haps[3])
+    assert list(querier.get_happenings(kater2, datetime(2014, 2, 1), datetime(2014, 7, 1))) == []
+    assert len(querier.active_happenings_bulk(datetime(2014, 2, 1), datetime(2014, 7, 1))) == 2
@@ -1,7 +1,9 @@
-from raumzeit.repo import Repository, NeoRepository, HappeningCollection
+from raumzeit.repo import Repository, NeoRepository, HappeningCollection, SchemaWarning
+from py2neo.error import GraphError
 from .util import clear_db, is_same_graph, graph
 import py2neo
 import pytest
+from unittest.mock import MagicMock
 
 def test_db_testing(graph):
     clear_db()
@@ -53,6 +55,22 @@ def test_casts(graph):
 
 
 
+def test_ensure_schema(graph):
+    clear_db()
+
+    repo = NeoRepository(graph, ensure_schema=False)
+    repo.ensure_schema()
+    assert repo.missing_schema() == []
+    assert repo.ensure_schema() == []
+    assert 'slug' in graph.schema.get_uniqueness_constraints('Happening')
+    assert 'url' in graph.schema.get_uniqueness_constraints('URI')
+
+    graph.cypher.execute("""CREATE (n: Artist {name: 'DJ1', slug: 'dj1'})""")
+    with pytest.raises(py2neo.error.GraphError) as exc:
+        graph.cypher.execute("""CREATE (n: Artist {name: 'DJ1', slug: 'dj1'})""")
+    assert "already exists" in str(exc.value)
+
+
 def test_subgraph_to_collection(graph):
     clear_db()
     graph.cypher.execute("""""")
@@ -75,6 +93,54 @@ def test_iter_all(graph):
         assert each['_label'] == 'Location'
 
 
+def test_iter_all_paginated(graph):
+    clear_db()
+
+    for i in range(7):
+        graph.cypher.execute("""CREATE (n: Location {name: {name}, desc: 'foo'})""", parameters={'name': str(i)})
+    graph.cypher.execute("""CREATE (n: Other {name: 'foobar'})""")
+
+    repo = NeoRepository(graph)
+    locations = list(repo.iter_all('Location', page_size=3))
+    assert sorted(l['name'] for l in locations) == [str(i) for i in range(7)]
+
+    projected = list(repo.iter_all('Location', page_size=7, props=['name']))
+    assert len(projected) == 7
+    for each in projected:
+        assert set(each.keys()) == set(['name', '_label'])
+        assert each['_label'] == 'Location'
+
+def test_ensure_schema_failures():
+    graph = MagicMock()
+    graph.schema.get_uniqueness_constraints.return_value = []
+
+    def execute(query, **kwargs):
+        if 'Artist' in query:
+            raise GraphError('Unable to create CONSTRAINT: duplicate slugs')
+    graph.cypher.execute.side_effect = execute
+
+    with pytest.warns(SchemaWarning, match=r'Artist\.slug \(Unable to create'):
+        repo = NeoRepository(graph)
+    assert graph.cypher.execute.call_count == 5
+
+    # the schema is checked again, as it is incomplete
+    graph.cypher.execute.side_effect = None
+    repo = NeoRepository(graph)
+    assert graph.cypher.execute.call_count == 10
+
+    graph.reset_mock()
+    repo = NeoRepository(graph)
+    assert graph.schema.get_uniqueness_constraints.call_count == 0
+
+def test_iter_all_rejects_property_names():
+    graph = MagicMock()
+    repo = NeoRepository(graph, ensure_schema=False)
+    for prop in ['name} DETACH DELETE n //', 'a b', '1name', '']:
+        with pytest.raises(ValueError):
+            list(repo.iter_all('Location', props=[prop]))
+    assert graph.cypher.execute.call_count == 0
+
+
 def test_get_one(graph):
     clear_db()
 
@@ -130,6 +196,11 @@ def test_generate_slug(graph):
     slugs = [NeoRepository.slugify(n) for n in names]
     assert slugs == ['kater-holzig', 'mop']
 
+    names = ['Club der Visionäre', 'Âme & Dixon', 'Berghain / Panorama Bar', 'Ø [Phase]', ' Live – DJ Set ']
+    slugs = [NeoRepository.slugify(n) for n in names]
+    assert slugs == ['club-der-visionare', 'ame-dixon', 'berghain-panorama-bar', 'phase', 'live-dj-set']
+    assert NeoRepository.slugify('Kater Holzig', delim='_') == 'kater_holzig'
+
     props = {'name': 'Kater Holzig', 'desc': 'Some Text'}
     slug = Repository.slugify('Kater Holzig', props)
     assert slug == 'kater-holzig-9b04172633'
@@ -164,6 +235,51 @@ def test_create_entity(graph):
     created_entity_b = repo._create_entity('Location', props)
     assert created_entity_b['slug'] == 'kater-holzig-9b04172633'
 
+def test_allocate_slugs(graph):
+    clear_db()
+    repo = NeoRepository(graph)
+    repo._create_entity('Happening', {'name': 'Live DJ Set'})
+
+    props_list = [{'name': 'Live DJ Set', 'desc': 'a'},
+                  {'name': 'Live DJ Set', 'desc': 'b'},
+                  {'name': 'Live DJ Set', 'desc': 'b'},
+                  {'name': 'Other Set'}]
+    hashed_a = Repository.slugify('Live DJ Set', props_list[0])
+    hashed_b = Repository.slugify('Live DJ Set', props_list[1])
+
+    allocated = repo._allocate_slugs('Happening', props_list)
+    slugs = [dct['slug'] for dct in allocated]
+    assert slugs == [hashed_a, hashed_b, hashed_b + '-2', 'other-set']
+    assert allocated[0]['desc'] == 'a'
+    assert 'slug' not in props_list[0]
+
+def test_create_entity_slug_race():
+    graph = MagicMock()
+    taken = []
+    # the slug is free when allocated, but another writer creates it before us
+    graph.cypher.execute.side_effect = lambda query, parameters: [MagicMock(slug=slug) for slug in taken
+                                                                  if slug in parameters['slugs']]
+    def create(node):
+        if node.properties['slug'] in taken:
+            raise GraphError('Node 7 already exists with label Happening and property "slug"')
+    graph.create.side_effect = create
+
+    repo = NeoRepository(graph, ensure_schema=False)
+    original = repo._allocate_slugs
+    def allocate_then_race(label, props_list):
+        allocated = original(label, props_list)
+        taken.append('live-dj-set')
+        return allocated
+    repo._allocate_slugs = allocate_then_race
+
+    node = repo._create_entity('Happening', {'name': 'Live DJ Set'})
+    assert node.properties['slug'] == Repository.slugify('Live DJ Set', {'name': 'Live DJ Set'})
+    assert graph.create.call_count == 2
+
+    graph.create.side_effect = GraphError('Unknown error')
+    with pytest.raises(GraphError):
+        repo._create_entity('Happening', {'name': 'Other Set'})
+
 def test_create_entity_with_links(graph):
     clear_db()
     repo = NeoRepository(graph)
@@ -273,8 +389,49 @@ def test_get_joined(graph):
     assert 'dj1' in artist_slugs
     assert 'dj2' in artist_slugs
 
-    # Next up!
-    #joined_both = repo.get_joined('Happening', 'foo-party', 'artists', 'location')
+
+def test_get_joined_many(graph):
+    clear_db()
+
+    repo = NeoRepository(graph)
+    graph.cypher.execute("""CREATE 
+                       (b:Artist {name:'DJ1', slug: 'dj1'})
+                       <-[:HOSTS]-
+                       (a:Happening {name:'foo party', slug: 'foo-party'})
+                       -[:HAPPENS_AT]->
+                       (c:Location {name:'Kater Holzig', slug: 'kater-holzig'})""")
+    graph.cypher.execute("""MATCH
+                       (a:Happening {slug: 'foo-party'})
+                       MERGE
+                       (a)-[:HOSTS]->
+                       (b:Artist {name:'DJ2', slug: 'dj2'})""")
+
+    joins = [('location', 'HAPPENS_AT', True), ('artists', 'HOSTS', False)]
+    joined = repo.get_joined_many('Happening', 'foo-party', joins)
+    assert joined['slug'] == 'foo-party'
+    assert joined['_label'] == 'Happening'
+    assert joined['location']['slug'] == 'kater-holzig'
+    assert set([a['slug'] for a in joined['artists']]) == set(['dj1', 'dj2'])
+
+    with pytest.raises(KeyError):
+        repo.get_joined_many('Happening', 'foo-party', [('links', 'IDENTIFIED_BY', False)])
+
+    with pytest.raises(KeyError):
+        repo.get_joined_many('Happening', 'no-party', joins)
+
+def test_compile_join_query():
+    query = NeoRepository._compile_join_query('Happening', ['HAPPENS_AT', 'HOSTS'])
+    assert query.count('OPTIONAL MATCH') == 2
+    assert 'MATCH (parent:Happening {slug: {slug}})' in query
+    assert query.endswith('RETURN parent, joined_0, joined_1')
+
+def test_compile_get_many_query():
+    query = NeoRepository._compile_get_many_query(['Location', 'Artist'])
+    assert query.count('UNION ALL') == 1
+    assert 'MATCH (n:Location) WHERE n.slug IN {slugs}' in query
+    assert 'MATCH (n:Artist) WHERE n.slug IN {slugs}' in query
+    assert 'MATCH (n)' not in query
+
     
 def test_return_joined(graph):
     parent_node = py2neo.Node('LableA', prop_a=1, prop_b='foo')
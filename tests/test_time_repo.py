@@ -2,7 +2,8 @@ from raumzeit.repo import Timeline
 from .util import clear_db, is_same_graph, has_sub_graph
 import py2neo
 import pytest
-from datetime import datetime
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
 
 HOST = 'localhost'
 neo_uri = 'http://{host}:7474/db/data/'.format(host=HOST)
@@ -68,11 +69,10 @@ def test_set_latest(graph):
 	tl = Timeline(graph)
 	graph.cypher.execute("""MATCH (n: HourIndex)
 							MERGE (n)-[:LATEST]->(m: Hour {start: '2014-01-01T12:00:00'})<-[:EARLIEST]-(n) """)
-	new_latest, = graph.create(py2neo.Node('Hour', start='2014-01-01T13:00:00'))
 	
-	tl._set_latest(new_latest)
+	tl._merge_hours(datetime(2014, 1, 1, 13), datetime(2014, 1, 1, 13))
 
-	assert tl.latest == new_latest
+	assert tl.latest.properties['start'] == '2014-01-01T13:00:00'
 	assert has_sub_graph("""CREATE (n: HourIndex)-[:LATEST]->(m: Hour {start: '2014-01-01T13:00:00'}) """)
 
 def test_set_earliest(graph):
@@ -80,11 +80,10 @@ def test_set_earliest(graph):
 	tl = Timeline(graph)
 	graph.cypher.execute("""MATCH (n: HourIndex)
 							MERGE (n)-[:LATEST]->(m: Hour {start: '2014-01-01T12:00:00'})<-[:EARLIEST]-(n) """)
-	new_earliest, = graph.create(py2neo.Node('Hour', start='2014-01-01T11:00:00'))
 	
-	tl._set_earliest(new_earliest)
+	tl._merge_hours(datetime(2014, 1, 1, 11), datetime(2014, 1, 1, 11))
 
-	assert tl.earliest == new_earliest
+	assert tl.earliest.properties['start'] == '2014-01-01T11:00:00'
 	assert has_sub_graph("""CREATE (n: HourIndex)-[:EARLIEST]->(m: Hour {start: '2014-01-01T11:00:00'}) """)
 
 def test_append_hours(graph):
@@ -92,7 +91,7 @@ def test_append_hours(graph):
 
 	tl = Timeline(graph)
 	tl._init_hour(datetime(2014, 1, 1, 12))
-	tl._append_hours(datetime(2014, 1, 1, 14))
+	tl._merge_hours(datetime(2014, 1, 1, 14), datetime(2014, 1, 1, 14))
 	
 	target = """CREATE (i: HourIndex)
 			  MERGE (i)-[:EARLIEST]->(n: Hour {start: '2014-01-01T12:00:00'})
@@ -105,7 +104,7 @@ def test_prepend_hours(graph):
 
 	tl = Timeline(graph)
 	tl._init_hour(datetime(2014, 1, 1, 12))
-	tl._prepend_hours(datetime(2014, 1, 1, 10))
+	tl._merge_hours(datetime(2014, 1, 1, 10), datetime(2014, 1, 1, 10))
 	
 	target = """CREATE (i: HourIndex)
 			  MERGE (i)-[:EARLIEST]->(n: Hour {start: '2014-01-01T10:00:00'})
@@ -113,6 +112,24 @@ def test_prepend_hours(graph):
 		     -[:NEXT]->(o: Hour {start: '2014-01-01T12:00:00'})<-[:LATEST]-(i)"""
 	assert is_same_graph(target)
 
+def test_merge_overlapping_hours(graph):
+	clear_db()
+
+	tl = Timeline(graph)
+	tl._merge_hours(datetime(2014, 1, 1, 12), datetime(2014, 1, 1, 13))
+	# a second writer with an outdated view of the timeline
+	earliest, latest = tl._merge_hours(datetime(2014, 1, 1, 11), datetime(2014, 1, 1, 14))
+
+	target = """CREATE (i: HourIndex)
+			  MERGE (i)-[:EARLIEST]->(n: Hour {start: '2014-01-01T11:00:00'})
+			 -[:NEXT]->(m: Hour {start: '2014-01-01T12:00:00'})
+			 -[:NEXT]->(o: Hour {start: '2014-01-01T13:00:00'})
+		     -[:NEXT]->(p: Hour {start: '2014-01-01T14:00:00'})<-[:LATEST]-(i)"""
+	assert is_same_graph(target)
+	assert earliest.properties['start'] == '2014-01-01T11:00:00'
+	assert latest.properties['start'] == '2014-01-01T14:00:00'
+	assert tl.latest == latest
+
 def test_hour_range(graph):
 
 	target_range = [datetime(2014, 1, 1, 12), datetime(2014, 1, 1, 13), datetime(2014, 1, 1, 14)]
@@ -122,6 +139,18 @@ def test_hour_range(graph):
 	range_b = Timeline._hour_range(datetime(2014, 1, 1, 12), len_range=3)
 	assert range_b == target_range
 
+def test_hour_strings():
+	target_strings = ['2014-01-01T22:00:00', '2014-01-01T23:00:00', '2014-01-02T00:00:00', '2014-01-02T01:00:00']
+	start, stop = datetime(2014, 1, 1, 22, 30), datetime(2014, 1, 2, 1, 10)
+
+	assert list(Timeline._iter_hour_strings(start, stop)) == target_strings
+	assert Timeline._hour_strings(start, stop) == target_strings
+
+	numpy = pytest.importorskip('numpy')
+	assert Timeline._hour_strings_np(start, stop) == target_strings
+	long_stop = datetime(2014, 3, 1)
+	assert Timeline._hour_strings_np(start, long_stop) == list(Timeline._iter_hour_strings(start, long_stop))
+
 def test_format_datetime(graph):
 	tl = Timeline(graph)
 	dt1 = datetime(2014, 1, 1, 12)
@@ -138,6 +167,19 @@ def test_format_datetime(graph):
 	assert tl._str_to_dt(dstring) == dt1
 
 
+def test_str_to_dt():
+	for dstring in ['2014-01-01T12:00:00', '1999-12-31T23:59:59', '2016-02-29T00:00:01']:
+		assert Timeline._str_to_dt(dstring) == datetime.strptime(dstring, '%Y-%m-%dT%H:%M:%S')
+
+	with pytest.raises(ValueError):
+		Timeline._str_to_dt('2014-13-01T12:00:00')
+	with pytest.raises(ValueError):
+		Timeline._str_to_dt('2014-01-01 12:00')
+	for dstring in ['2014-01-01T+1:00:00', '2014-01-01T 1:00:00', '2014-01-01T\u0661\u0662:00:00']:
+		with pytest.raises(ValueError):
+			Timeline._str_to_dt(dstring)
+
+
 def test_create_timespan_cold(graph):
 	clear_db()
 	tl = Timeline(graph)
@@ -309,3 +351,138 @@ def test_multiple_timespans(graph):
 	tl.create_timespan(datetime(2014, 1, 1, 20, 30), datetime(2014, 1, 1, 21, 10))
 	tl.create_timespan(datetime(2014, 1, 1, 21, 30), datetime(2014, 1, 2, 1, 10))
 
+def test_create_timespan_roundtrips():
+	graph = MagicMock()
+	tl = Timeline(graph)
+	start = datetime(2014, 1, 1, 18)
+	# a warm timeline that already covers all timespans
+	tl._cache_boundary('EARLIEST', py2neo.Node('Hour', start='2014-01-01T00:00:00'))
+	tl._cache_boundary('LATEST', py2neo.Node('Hour', start='2014-01-31T00:00:00'))
+
+	for num_hours in [3, 24, 72]:
+		graph.reset_mock()
+		tl.create_timespan(start, start + timedelta(hours=num_hours))
+		assert graph.find_one.call_count == 0
+		assert graph.create.call_count == 0
+		assert graph.cypher.execute.call_count == 1
+		params = graph.cypher.execute.call_args[1]['parameters']
+		assert len(params['hours']) == num_hours + 1
+
+def test_boundary_cache():
+	graph = MagicMock()
+	tl = Timeline(graph)
+
+	tl.latest
+	tl.latest
+	tl.earliest
+	assert graph.match_one.call_count == 2
+
+	new_latest = MagicMock()
+	graph.cypher.execute.return_value = [MagicMock(connected=True, latest=new_latest)]
+	tl.invalidate_boundaries()
+	tl._merge_hours(datetime(2014, 1, 1, 12), datetime(2014, 1, 1, 13))
+	graph.reset_mock()
+	assert tl.latest is new_latest
+	assert graph.match_one.call_count == 0
+
+	tl.invalidate_boundaries()
+	tl.latest
+	assert graph.match_one.call_count == 1
+
+def test_boundary_cache_revalidation():
+	graph = MagicMock()
+	tl = Timeline(graph, revalidate_after=0)
+
+	tl.latest
+	tl.latest
+	assert graph.match_one.call_count == 2
+
+def test_boundary_cache_missing():
+	graph = MagicMock()
+	graph.match_one.return_value = None
+	tl = Timeline(graph)
+
+	assert tl.latest is None
+	assert tl.latest is None
+	assert graph.match_one.call_count == 2
+
+	# another process initialised the timeline
+	graph.match_one.return_value = MagicMock()
+	assert tl.latest is graph.match_one.return_value.end_node
+	tl.latest
+	assert graph.match_one.call_count == 3
+
+def test_run_to_merge():
+	start, stop = datetime(2014, 1, 1, 20), datetime(2014, 1, 1, 22)
+	assert Timeline._run_to_merge(start, stop, None, None) == Timeline._hour_strings(start, stop)
+	# the run reaches back to the latest hour instead of leaving a gap
+	run = Timeline._run_to_merge(start, stop, '2014-01-01T09:00:00', '2014-01-01T10:00:00')
+	assert run == Timeline._hour_strings(datetime(2014, 1, 1, 10), stop)
+	run = Timeline._run_to_merge(datetime(2014, 1, 1, 5), datetime(2014, 1, 1, 6), '2014-01-01T09:00:00', '2014-01-01T10:00:00')
+	assert run == Timeline._hour_strings(datetime(2014, 1, 1, 5), datetime(2014, 1, 1, 9))
+	run = Timeline._run_to_merge(datetime(2014, 1, 1, 8), stop, '2014-01-01T09:00:00', '2014-01-01T10:00:00')
+	assert run == Timeline._hour_strings(datetime(2014, 1, 1, 8), stop)
+	assert Timeline._run_to_merge(start, stop, '2014-01-01T00:00:00', '2014-01-02T00:00:00') == []
+
+def make_shared_timeline_graph():
+	""" A fake graph whose merge statements update one shared timeline, like two processes would. """
+	state = {'hours': set()}
+
+	def hour_node(start):
+		return None if start is None else MagicMock(properties={'start': start})
+
+	def match_one(index, rel_label):
+		hours = sorted(state['hours'])
+		if not hours:
+			return None
+		return MagicMock(end_node=hour_node(hours[0] if rel_label == 'EARLIEST' else hours[-1]))
+
+	def execute(query, parameters=None):
+		if not parameters or 'first' not in parameters:
+			return []
+		hours = sorted(state['hours'])
+		connected = not hours or (parameters['first'] <= hours[-1] and parameters['last'] >= hours[0])
+		if connected:
+			state['hours'].update(parameters['hours'])
+		hours = sorted(state['hours'])
+		return [MagicMock(connected=connected, earliest=hour_node(hours[0]), latest=hour_node(hours[-1]))]
+
+	graph = MagicMock()
+	graph.match_one.side_effect = match_one
+	graph.cypher.execute.side_effect = execute
+	return graph, state
+
+def test_extend_timeline_two_writers():
+	graph, state = make_shared_timeline_graph()
+	writer_a, writer_b = Timeline(graph), Timeline(graph)
+	assert writer_a.latest is None and writer_b.latest is None
+
+	writer_a._extend_timeline(datetime(2014, 1, 1, 10), datetime(2014, 1, 1, 10))
+	# writer b saw the empty timeline before writer a wrote, so its first run misses the timeline
+	graph.cypher.execute.reset_mock()
+	writer_b._merge_hours(datetime(2014, 1, 1, 20), datetime(2014, 1, 1, 22))
+	assert graph.cypher.execute.call_count == 2
+
+	assert sorted(state['hours']) == Timeline._hour_strings(datetime(2014, 1, 1, 10), datetime(2014, 1, 1, 22))
+	assert writer_b.earliest.properties['start'] == '2014-01-01T10:00:00'
+	assert writer_b.latest.properties['start'] == '2014-01-01T22:00:00'
+
+	writer_a._extend_timeline(datetime(2014, 1, 1, 8), datetime(2014, 1, 1, 9))
+	assert sorted(state['hours']) == Timeline._hour_strings(datetime(2014, 1, 1, 8), datetime(2014, 1, 1, 22))
+
+def test_compile_timeframe_params_long_lived_reader():
+	graph, state = make_shared_timeline_graph()
+	writer, reader = Timeline(graph), Timeline(graph)
+
+	writer._extend_timeline(datetime(2014, 1, 1), datetime(2014, 1, 31))
+	params = reader.compile_timeframe_params(datetime(2014, 1, 10), datetime(2014, 2, 10))
+	assert params == {'start': '2014-01-10T00:00:00', 'stop': '2014-01-31T00:00:00'}
+
+	# the reader's cached boundaries are outdated once the writer extends the timeline
+	writer._extend_timeline(datetime(2014, 3, 1), datetime(2014, 3, 31))
+	params = reader.compile_timeframe_params(datetime(2014, 2, 1), datetime(2014, 2, 10))
+	assert params == {'start': '2014-02-01T00:00:00', 'stop': '2014-02-10T00:00:00'}
+	assert reader.latest.properties['start'] == '2014-03-31T00:00:00'
+
+	params = reader.compile_timeframe_params(datetime(2013, 2, 1), datetime(2015, 2, 10), clamp=False)
+	assert params == {'start': '2013-02-01T00:00:00', 'stop': '2015-02-10T00:00:00'}